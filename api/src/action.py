@@ -5,7 +5,7 @@ function to trigger a model update.
 """
 
 from dataclasses import dataclass
-import oplc_etl.pipelines
+from oplc_etl.pipelines import google_spreadsheet as etl
 import pandas as pa
 from typing import Union
 
@@ -18,14 +18,19 @@ class NoAction:
 class DataFrameUpdate:
     experiences_skills_df: pa.DataFrame
     jobs_skills_df: pa.DataFrame
+    jobs: dict[int, str]
+    skills: dict[int, str]
+    experiences: dict[int, tuple[str, str]]
 
 
 def pull_data_source() -> DataFrameUpdate:
-    es_df = oplc_etl.pipelines.experiences_skills_df(skip_if_exists=False)
-    js_df = oplc_etl.pipelines.jobs_skills_df(skip_if_exists=False)
+    etl.pull_sources()
     return DataFrameUpdate(
-            experiences_skills_df=es_df, # type: ignore
-            jobs_skills_df=js_df, # type: ignore
+            experiences_skills_df=etl.experiences_skills(),
+            jobs_skills_df=etl.jobs_skills(),
+            jobs=etl.jobs(),
+            skills=etl.skills(),
+            experiences=etl.experiences(),
             )
 
 Action = Union[
@@ -6,15 +6,26 @@ https://www.infoq.com/articles/no-more-mvc-frameworks/.
 """
 
 import logging
+import json
+from time import perf_counter
+from pathlib import Path
 
-from fastapi import FastAPI
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Optional, TypeVar
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Match
 from src.config import API_ROOT_PATH, CORS_ALLOWED_ORIGINS
-from src import model, action, view
-import networkx as nx
+from src import config, model, view, http_cache, traces
+from src.backend import Backend, BackendOverloaded, BackendTimeout
+from src.refresh import Refresher
+from oplc_model import centrality, metrics
 
 logging.getLogger().setLevel(logging.INFO)
 
+T = TypeVar("T")
+
 
 app = FastAPI(root_path=API_ROOT_PATH)
 
@@ -26,34 +37,452 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.get("/experiences")
-async def get_experiences() -> dict[view.ExperienceIdJson, view.ExperienceJson]:
-    return view.experiences_json(model.get())
+backend = Backend(
+        kind=config.EXECUTION_BACKEND, # type:ignore
+        workers=config.EXECUTION_WORKERS,
+        max_pending=config.EXECUTION_MAX_PENDING,
+        timeout=config.EXECUTION_TIMEOUT_SECONDS,
+        )
+
+# Process workers are restarted to see the new model.
+refresher = Refresher(on_installed=backend.restart)
+
+
+# Requests are counted and timed by route, the stages of the model functions
+# are recorded by the functions themselves, see oplc_model.metrics. With the
+# process backend, the stages computed on the workers are recorded in the
+# worker processes and don't show up at /metrics.
+
+REQUESTS = metrics.Counter(
+        "oplc_http_requests_total",
+        "HTTP requests by route, method and status.",
+        ["route", "method", "status"],
+        registry=metrics.REGISTRY,
+        )
+
+REQUEST_SECONDS = metrics.Histogram(
+        "oplc_http_request_seconds",
+        "Duration of the HTTP requests by route, until the response starts.",
+        ["route"],
+        registry=metrics.REGISTRY,
+        )
+
+
+def route_path(request: Request) -> str:
+    # The path template of the route rather than the path, so that path
+    # parameters don't make new series.
+    for route in app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path # type:ignore
+    return "unmatched"
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next) -> Response:
+    start = perf_counter()
+    # Unhandled exceptions go past the middleware, they are answered with a
+    # 500 by the server.
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        route = route_path(request)
+        REQUEST_SECONDS.observe(perf_counter() - start, route=route)
+        REQUESTS.inc(route=route, method=request.method, status=status)
+
+
+slow_requests = traces.SlowRequestLog(
+        Path(config.TRACE_FILE) if config.TRACE_FILE else None,
+        threshold=config.TRACE_SLOW_REQUEST_SECONDS,
+        sample_rate=config.TRACE_SAMPLE_RATE,
+        max_bytes=config.TRACE_FILE_MAX_BYTES,
+        backups=config.TRACE_FILE_BACKUPS,
+        )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> Response:
+    """Metrics in the Prometheus text format."""
+    return Response(content=metrics.REGISTRY.render(),
+                    media_type=metrics.CONTENT_TYPE)
+
+
+# The /experiences, /jobs and /skills responses are rendered once per data set
+# version and validated with an ETag.
+
+def catalog_response(
+        name: str,
+        if_none_match: Optional[str],
+        accept_encoding: Optional[str],
+        ) -> Response:
+    return http_cache.response(model.catalog_payload(model.get(), name),
+                               if_none_match, accept_encoding)
 
 
-@app.get("/jobs")
-async def get_jobs() -> dict[view.ExperienceIdJson, view.JobJson]:
-    return view.jobs_json(model.get())
+@app.get(
+        "/experiences",
+        response_model=dict[view.ExperienceIdJson, view.ExperienceJson],
+        )
+async def get_experiences(
+        if_none_match: Optional[str] = Header(None),
+        accept_encoding: Optional[str] = Header(None),
+        ) -> Response:
+    return catalog_response("experiences", if_none_match, accept_encoding)
 
 
-@app.get("/skills")
-async def get_skills() -> dict[view.SkillIdJson, view.SkillJson]:
-    return view.skills_json(model.get())
+@app.get("/experiences/search")
+async def get_experiences_search(
+        q: str,
+        limit: int = 20,
+        ) -> list[view.ExperienceSearchResultJson]:
+    return view.experience_search_json(model.get(), q, limit)
 
 
-@app.post("/pull_data_source")
-async def post_pull_data_source() -> None:
-    model.present(action.pull_data_source())
+@app.get(
+        "/jobs",
+        response_model=dict[view.JobIdJson, view.JobJson],
+        )
+async def get_jobs(
+        if_none_match: Optional[str] = Header(None),
+        accept_encoding: Optional[str] = Header(None),
+        ) -> Response:
+    return catalog_response("jobs", if_none_match, accept_encoding)
 
 
-@app.post("/job_recommendation")
+@app.get(
+        "/skills",
+        response_model=dict[view.SkillIdJson, view.SkillJson],
+        )
+async def get_skills(
+        if_none_match: Optional[str] = Header(None),
+        accept_encoding: Optional[str] = Header(None),
+        ) -> Response:
+    return catalog_response("skills", if_none_match, accept_encoding)
+
+
+@app.post("/pull_data_source", status_code=202)
+async def post_pull_data_source() -> view.RefreshJobJson:
+    """Start refreshing the data in the background.
+
+    Poll /pull_data_source/{job_id} for the status of the refresh.
+    """
+    return view.refresh_job_json(refresher.request())
+
+
+@app.get("/pull_data_source/{job_id}")
+async def get_pull_data_source(job_id: str) -> view.RefreshJobJson:
+    job = refresher.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown refresh job")
+    return view.refresh_job_json(job)
+
+
+@app.post(
+        "/job_recommendation",
+        response_model=view.JobRecommendationJson,
+        )
 async def post_job_recommendation(
         experiences: list[view.ExperienceIdJson],
         return_graph: bool = False,
+        skill_centrality_measure: centrality.CentralityMeasureName = "betweenness",
+        centrality_sources: Optional[int] = Query(None, ge=1),
+        centrality_seed: Optional[int] = None,
+        if_none_match: Optional[str] = Header(None),
+        ) -> Response:
+    """Job recommendation for the experiences.
+
+    The response has a Server-Timing header with the duration of the stages.
+    """
+    m = model.get()
+    unknown = view.unknown_experiences(m, experiences)
+    if len(unknown) > 0:
+        raise HTTPException(status_code=422,
+                            detail=f"Unknown experiences: {unknown}")
+
+    start = perf_counter()
+    with metrics.trace() as trace:
+        try:
+            response = await job_recommendation_response(
+                    m,
+                    experiences,
+                    return_graph,
+                    skill_centrality_measure,
+                    centrality_sources,
+                    centrality_seed,
+                    if_none_match,
+                    )
+        finally:
+            total = perf_counter() - start
+            slow_requests.record(trace, total, {
+                "experiences": experiences,
+                "return_graph": return_graph,
+                "skill_centrality_measure": skill_centrality_measure,
+                "centrality_sources": centrality_sources,
+                "centrality_seed": centrality_seed,
+                "dataset_version": m.dataset_version,
+                "dataset_hash": m.dataset_hash,
+                })
+
+    response.headers["Server-Timing"] = traces.server_timing(trace, total)
+    return response
+
+
+async def job_recommendation_response(
+        m: model.Model,
+        experiences: list[view.ExperienceIdJson],
+        return_graph: bool,
+        skill_centrality_measure: centrality.CentralityMeasureName,
+        centrality_sources: Optional[int],
+        centrality_seed: Optional[int],
+        if_none_match: Optional[str],
+        ) -> Response:
+    # The recommendation doesn't depend on the order of the experiences.
+    etag = http_cache.etag(
+            "job_recommendation", m.dataset_version, m.dataset_hash,
+            sorted(experiences), return_graph, skill_centrality_measure,
+            centrality_sources, centrality_seed,
+            )
+    if http_cache.etag_matches(if_none_match, etag):
+        return http_cache.not_modified(etag)
+
+    cached = m.response_cache.get(etag)
+    if cached is None:
+        try:
+            recommendation = await backend.run(
+                    job_recommendation,
+                    experiences,
+                    return_graph,
+                    skill_centrality_measure,
+                    centrality_sources,
+                    centrality_seed,
+                    )
+        except BackendOverloaded:
+            raise HTTPException(status_code=503, detail="Too many pending requests")
+        except BackendTimeout:
+            raise HTTPException(status_code=504, detail="Job recommendation timed out")
+        with metrics.stage("serialization"):
+            body = http_cache.json_bytes(recommendation)
+        cached = http_cache.CachedResponse(etag=etag, body=body)
+        m.response_cache.put(cached)
+
+    return http_cache.response(cached, None)
+
+
+# Runs on the backend workers. The centrality measure is given by name, since
+# functions can't be sent to process workers.
+def job_recommendation(
+        experiences: list[view.ExperienceIdJson],
+        return_graph: bool,
+        skill_centrality_measure: centrality.CentralityMeasureName,
+        centrality_sources: Optional[int],
+        centrality_seed: Optional[int],
         ) -> view.JobRecommendationJson:
     return view.job_recommendation_json(
             model.get(),
             experiences,
             return_graph,
-            lambda g: nx.betweenness_centrality(g, endpoints=True), #type:ignore
+            centrality.centrality_measure(
+                skill_centrality_measure,
+                sources=centrality_sources,
+                seed=centrality_seed,
+                ),
+            )
+
+
+@app.post(
+        "/job_recommendation/batch",
+        response_model=view.JobRecommendationBatchJson,
+        )
+async def post_job_recommendation_batch(
+        experience_sets: list[list[view.ExperienceIdJson]],
+        skill_centrality_measure: centrality.CentralityMeasureName = "betweenness",
+        centrality_sources: Optional[int] = Query(None, ge=1),
+        centrality_seed: Optional[int] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        stream: bool = False,
+        ) -> Response | view.JobRecommendationBatchJson:
+    """Job recommendations without skill graphs for several experience sets.
+
+    The experience sets are sent to the backend one chunk at a time, each
+    chunk with the timeout of a single request. With stream, the items are
+    sent as newline delimited JSON as soon as their chunk is done.
+    """
+    unknown = view.unknown_experiences(
+            model.get(), [e for es in experience_sets for e in es])
+    if len(unknown) > 0:
+        raise HTTPException(status_code=422,
+                            detail=f"Unknown experiences: {unknown}")
+
+    def run(start: int, end: int):
+        return backend.run(
+                job_recommendation_batch,
+                experience_sets[start:end],
+                start,
+                skill_centrality_measure,
+                centrality_sources,
+                centrality_seed,
+                limit,
+                )
+
+    chunk_size = config.BATCH_STREAM_CHUNK_SIZE
+
+    if not stream:
+        items = []
+        for start in range(0, len(experience_sets), chunk_size):
+            try:
+                items += await run(start, start + chunk_size)
+            except BackendOverloaded:
+                raise HTTPException(status_code=503, detail="Too many pending requests")
+            except BackendTimeout:
+                raise HTTPException(status_code=504, detail="Job recommendation timed out")
+        return view.JobRecommendationBatchJson(items=items)
+
+    async def lines() -> AsyncIterator[str]:
+        for start in range(0, len(experience_sets), chunk_size):
+            try:
+                items = await run(start, start + chunk_size)
+            except (BackendOverloaded, BackendTimeout) as e:
+                # The status has already been sent.
+                yield json.dumps({"error": type(e).__name__}) + "\n"
+                return
+            for item in items:
+                yield item.json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# Runs on the backend workers, the skill graphs of the batch being computed in
+# parallel on threads. The threads are shared by all the batches of a process,
+# so that concurrent batches don't multiply them.
+batch_executor = ThreadPoolExecutor(config.BATCH_WORKERS)
+
+
+def job_recommendation_batch(
+        experience_sets: list[list[view.ExperienceIdJson]],
+        first_index: int,
+        skill_centrality_measure: centrality.CentralityMeasureName,
+        centrality_sources: Optional[int],
+        centrality_seed: Optional[int],
+        limit: Optional[int],
+        ) -> list[view.JobRecommendationBatchItemJson]:
+    return view.job_recommendation_batch_json(
+            model.get(),
+            experience_sets,
+            first_index,
+            centrality.centrality_measure(
+                skill_centrality_measure,
+                sources=centrality_sources,
+                seed=centrality_seed,
+                ),
+            limit,
+            batch_executor,
+            )
+
+
+# Accessibility endpoints. The individual is sent in the request body and the
+# options as query parameters, with the same defaults as the Streamlit page.
+
+async def run_accessibility(
+        view_fn: Callable[..., T],
+        individual: view.IndividualJson,
+        *args: Any,
+        ) -> T:
+    if model.get().accessibility is None:
+        raise HTTPException(status_code=404,
+                            detail="Accessibility endpoints are disabled")
+    try:
+        return await backend.run(accessibility, view_fn, individual, *args)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BackendOverloaded:
+        raise HTTPException(status_code=503, detail="Too many pending requests")
+    except BackendTimeout:
+        raise HTTPException(status_code=504, detail="Accessibility timed out")
+
+
+# Runs on the backend workers.
+def accessibility(
+        view_fn: Callable[..., T],
+        individual: view.IndividualJson,
+        *args: Any,
+        ) -> T:
+    a = model.get().accessibility
+    if a is None:
+        raise ValueError("Accessibility endpoints are disabled")
+    return view_fn(a, individual, *args)
+
+
+@app.post("/accessibility/model")
+async def post_accessibility_model(
+        individual: view.IndividualJson,
+        ) -> view.IndividualModelJson:
+    """Skills, main job, main sector and level deduced from the experiences."""
+    return await run_accessibility(view.individual_model_json, individual)
+
+
+@app.post("/accessibility/jobs")
+async def post_accessibility_jobs(
+        individual: view.IndividualJson,
+        same_sector_first: bool = True,
+        hide_practiced_jobs: bool = True,
+        weigh_by_level_diff: bool = True,
+        show_level_min: int = 1,
+        show_level_max: int = 8,
+        limit: int = Query(10, ge=1),
+        ) -> list[view.JobAccessibilityItemJson]:
+    """The most accessible jobs, with the skills explaining them."""
+    return await run_accessibility(
+            view.job_accessibility_json,
+            individual,
+            same_sector_first,
+            hide_practiced_jobs,
+            weigh_by_level_diff,
+            show_level_min,
+            show_level_max,
+            limit,
+            )
+
+
+@app.post("/accessibility/skills")
+async def post_accessibility_skills(
+        individual: view.IndividualJson,
+        skills: Optional[list[view.ReferentialSkillIdJson]] = Query(None),
+        limit: int = Query(10, ge=1),
+        ) -> list[view.SkillAccessibilityItemJson]:
+    """The limit most accessible skills, among the given skills if any."""
+    return await run_accessibility(
+            view.skill_accessibility_json,
+            individual,
+            skills,
+            limit,
+            )
+
+
+@app.post("/accessibility/skill_potential")
+async def post_accessibility_skill_potential(
+        individual: view.IndividualJson,
+        same_sector_first: bool = True,
+        hide_practiced_jobs: bool = True,
+        weigh_by_level_diff: bool = True,
+        weigh_by_job_accessibility: bool = True,
+        show_level_min: int = 1,
+        show_level_max: int = 8,
+        limit: int = Query(10, ge=1),
+        jobs_limit: int = Query(10, ge=0),
+        ) -> list[view.SkillPotentialItemJson]:
+    """The skills increasing job accessibility the most when developed."""
+    return await run_accessibility(
+            view.skill_potential_json,
+            individual,
+            same_sector_first,
+            hide_practiced_jobs,
+            weigh_by_level_diff,
+            weigh_by_job_accessibility,
+            show_level_min,
+            show_level_max,
+            limit,
+            jobs_limit,
             )
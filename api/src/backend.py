@@ -0,0 +1,119 @@
+"""Execution backends for CPU bound work.
+
+The endpoints run on the event loop. Heavy computations, like job
+recommendations, are dispatched to a pool of threads or processes so that the
+event loop keeps serving the other requests. The number of pending tasks is
+bounded and each task has a timeout. The inline backend runs the tasks
+directly on the event loop, without bound nor timeout.
+
+Thread workers run the tasks in a copy of the caller's context, so that the
+stages they record are added to the trace of the request, see
+oplc_model.metrics. Process workers are forked from the server process, so they see the model as
+it was when the pool was started. The pool must be restarted when the model
+changes. Functions and arguments sent to process workers must be picklable.
+"""
+
+import asyncio
+import contextvars
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Literal, Optional, TypeVar
+
+BackendKind = Literal["inline", "thread", "process"]
+
+T = TypeVar("T")
+
+
+class BackendOverloaded(Exception):
+    pass
+
+
+class BackendTimeout(Exception):
+    pass
+
+
+class Backend:
+
+    def __init__(
+            self,
+            kind: BackendKind,
+            workers: Optional[int],
+            max_pending: int,
+            timeout: Optional[float],
+            ):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = 0
+        self._lock = Lock()
+        self._executor = self._mk_executor()
+
+    def _mk_executor(self) -> Optional[Executor]:
+        if self.kind == "thread":
+            return ThreadPoolExecutor(self.workers)
+        elif self.kind == "process":
+            return ProcessPoolExecutor(
+                    self.workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                    )
+        else:
+            return None
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run fn(*args) on the backend.
+
+        Raises BackendOverloaded if too many tasks are pending and
+        BackendTimeout if the task doesn't end in time.
+        """
+        if self.kind == "inline":
+            return fn(*args)
+
+        # The task is submitted under the lock so that restart doesn't shut
+        # the pool down in between. A task is pending until it really ends,
+        # even if it timed out, so that the bound holds for the work actually
+        # queued on the workers.
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise BackendOverloaded()
+            executor: Executor = self._executor # type:ignore
+            self._pending += 1
+            try:
+                if self.kind == "thread":
+                    future: Future[T] = executor.submit(
+                            contextvars.copy_context().run, fn, *args)
+                else:
+                    future = executor.submit(fn, *args)
+            except BaseException:
+                self._pending -= 1
+                raise
+
+        # Outside the lock, since the callback runs right away if the task
+        # has already ended.
+        future.add_done_callback(self._done)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise BackendTimeout()
+
+    def _done(self, _: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def restart(self) -> None:
+        """Replace the process pool so that new workers see the current model.
+
+        Tasks already submitted end on the old pool.
+        """
+        if self.kind == "process":
+            with self._lock:
+                old = self._executor
+                self._executor = self._mk_executor()
+            if old is not None:
+                old.shutdown(wait=False)
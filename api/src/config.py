@@ -11,5 +11,51 @@ CORS_ALLOWED_ORIGINS = getenv_checked("CORS_ALLOWED_ORIGINS").split()
 API_ROOT_PATH = getenv_checked("API_ROOT_PATH") or "/"
 DEFAULT_DATA_SET = "Base de données proto orientation par les compétences"
 
+# Skill graph layout, see oplc_model.layout. LAYOUT_WORKERS threads lay out
+# the components of a graph in parallel, none if 0.
+LAYOUT_ALGORITHM = os.getenv("LAYOUT_ALGORITHM") or "stress"
+LAYOUT_FALLBACK = os.getenv("LAYOUT_FALLBACK") or "spectral"
+LAYOUT_BUDGET_SECONDS = float(os.getenv("LAYOUT_BUDGET_SECONDS") or "1.0")
+LAYOUT_WORKERS = int(os.getenv("LAYOUT_WORKERS") or "0")
 
+# Skill graphs take the positions of their skills on a global skill map laid
+# out once per data set, unless SKILL_MAP is 0.
+SKILL_MAP = (os.getenv("SKILL_MAP") or "1") != "0"
+SKILL_MAP_RELAXATION_STEPS = int(os.getenv("SKILL_MAP_RELAXATION_STEPS") or "2")
 
+# Execution backend of the job recommendations, see src.backend:
+# inline, thread or process.
+EXECUTION_BACKEND = os.getenv("EXECUTION_BACKEND") or "thread"
+EXECUTION_WORKERS = int(os.getenv("EXECUTION_WORKERS") or str(os.cpu_count() or 1))
+EXECUTION_MAX_PENDING = int(os.getenv("EXECUTION_MAX_PENDING") or "64")
+EXECUTION_TIMEOUT_SECONDS = float(os.getenv("EXECUTION_TIMEOUT_SECONDS") or "30")
+
+# Batch recommendations: number of threads computing the skill graphs of a
+# batch and number of experience sets per chunk sent to the backend, streamed
+# or not.
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS") or str(os.cpu_count() or 1))
+BATCH_STREAM_CHUNK_SIZE = int(os.getenv("BATCH_STREAM_CHUNK_SIZE") or "32")
+
+# Whether the /experiences, /jobs and /skills payloads also have a gzip
+# variant.
+CATALOG_GZIP = (os.getenv("CATALOG_GZIP") or "1") != "0"
+
+# Job and skill accessibility endpoints, computed with
+# oplc_model.model_skill_cooc on the jobs, skills and sectors of the neo4j
+# referential. They are disabled unless ACCESSIBILITY is 1.
+ACCESSIBILITY = (os.getenv("ACCESSIBILITY") or "0") != "0"
+ACCESSIBILITY_SPARSE = (os.getenv("ACCESSIBILITY_SPARSE") or "0") != "0"
+
+# Job recommendations taking more than TRACE_SLOW_REQUEST_SECONDS are written
+# to TRACE_FILE with probability TRACE_SAMPLE_RATE, see src.traces. The file
+# is rotated when it reaches TRACE_FILE_MAX_BYTES, keeping TRACE_FILE_BACKUPS
+# old files. No trace is written if TRACE_FILE is empty.
+TRACE_FILE = os.getenv("TRACE_FILE", "/tmp/diagoriente-oplc/traces/slow_requests.jsonl")
+TRACE_SLOW_REQUEST_SECONDS = float(os.getenv("TRACE_SLOW_REQUEST_SECONDS") or "1.0")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE") or "1.0")
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES") or str(10 * 1024 * 1024))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS") or "3")
+
+# Model snapshot the API starts from when it exists, built with
+# python -m src.snapshot. The data sets are loaded from the ETL otherwise.
+MODEL_SNAPSHOT = os.getenv("MODEL_SNAPSHOT") or None
@@ -0,0 +1,164 @@
+"""HTTP response caching.
+
+Responses computed from the model only depend on the data set and on the
+request inputs. They are given a strong ETag derived from both, clients
+revalidate with If-None-Match and get a 304 Not Modified when the ETag matches.
+The serialized bodies are kept in a server side LRU cache, keyed by the ETag.
+"""
+
+import gzip
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import sha256
+from threading import Lock
+from typing import Any, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from oplc_model import metrics
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    etag: str
+    body: bytes
+    media_type: str = "application/json"
+    # Body compressed with gzip, sent to clients accepting it.
+    gzip_body: Optional[bytes] = None
+
+
+def etag(*parts: Any) -> str:
+    """Strong ETag of JSON serializable parts.
+
+    >>> etag(1, "a") == etag(1, "a")
+    True
+    >>> etag(1, "a") == etag(1, "b")
+    False
+    """
+    digest = sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag.
+
+    If-None-Match uses the weak comparison, ignoring the W/ prefix.
+
+    >>> etag_matches('W/"a", "b"', '"a"')
+    True
+    >>> etag_matches('"b"', '"a"')
+    False
+    >>> etag_matches("*", '"a"')
+    True
+    """
+    if if_none_match is None:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return any(t == "*" or t.removeprefix("W/") == etag for t in tags)
+
+
+def json_bytes(content: Any) -> bytes:
+    # Same encoding as fastapi.responses.JSONResponse.
+    return json.dumps(
+            jsonable_encoder(content),
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            ).encode("utf-8")
+
+
+class ResponseCache:
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._responses: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, etag: str) -> Optional[CachedResponse]:
+        with self._lock:
+            response = self._responses.get(etag)
+            if response is not None:
+                self._responses.move_to_end(etag)
+        metrics.CACHE_REQUESTS.inc(cache="responses",
+                                   result="miss" if response is None else "hit")
+        return response
+
+    def put(self, response: CachedResponse) -> None:
+        with self._lock:
+            self._responses[response.etag] = response
+            self._responses.move_to_end(response.etag)
+            while len(self._responses) > self.max_size:
+                self._responses.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._responses.clear()
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether an Accept-Encoding header accepts gzip.
+
+    >>> accepts_gzip("gzip, deflate, br")
+    True
+    >>> accepts_gzip("br;q=1.0, gzip;q=0")
+    False
+    """
+    if accept_encoding is None:
+        return False
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip() in ("gzip", "*"):
+            try:
+                return float(params.strip().removeprefix("q=") or "1") > 0
+            except ValueError:
+                return False
+    return False
+
+
+def gzip_etag(etag: str) -> str:
+    # Each representation has its own strong ETag.
+    return etag[:-1] + '-gzip"'
+
+
+
+def response(
+        cached: CachedResponse,
+        if_none_match: Optional[str],
+        accept_encoding: Optional[str] = None,
+        ) -> Response:
+    compressed = cached.gzip_body is not None and accepts_gzip(accept_encoding)
+    etag = gzip_etag(cached.etag) if compressed else cached.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if cached.gzip_body is not None:
+        headers["Vary"] = "Accept-Encoding"
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    elif compressed:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=cached.gzip_body, media_type=cached.media_type,
+                        headers=headers)
+    else:
+        return Response(content=cached.body, media_type=cached.media_type,
+                        headers=headers)
+
+
+def payload(
+        etag: str,
+        content: Any,
+        compress: bool,
+        ) -> CachedResponse:
+    """A response rendered once, optionally with its gzip variant."""
+    body = json_bytes(content)
+    return CachedResponse(
+            etag=etag,
+            body=body,
+            gzip_body=gzip.compress(body, mtime=0) if compress else None,
+            )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304,
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
@@ -6,32 +6,225 @@ only perform model state read and write operations. All logic should go in
 oplc.core.
 """
 
-from dataclasses import dataclass
+import logging
+from dataclasses import dataclass, replace
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from pathlib import Path
+from typing import Optional
 
-from lenses import lens
-import oplc_model.model as core
+import numpy as np
+import numpy.typing as npt
+import pandas as pa
+import oplc_model.model_job_skill_graph as core
+import oplc_model.model_skill_cooc as cooc
+from oplc_model.layout import LayoutEngine
+from oplc_model.catalog import Catalog, mk_catalog
+from src import config
+from src import http_cache
+from src.http_cache import CachedResponse, ResponseCache
 from src import action
-import oplc_etl.pipelines as etl
+from src import snapshot
+from oplc_etl.pipelines import google_spreadsheet as etl
+
+
+# The data of the accessibility endpoints that doesn't depend on the
+# individual: the job index holds the jobs × skills matrix with the
+# job norms, levels and sectors, and the masked skill co-occurrence its row
+# norms. Requests only compute the products with the individual's skills.
+
+@dataclass(frozen=True)
+class Accessibility:
+    jobs: cooc.Jobs
+    skills: cooc.Skills
+    sectors: cooc.Sectors
+    jobs_skills: cooc.JobsSkills | cooc.SparseJobsSkills
+    job_index: cooc.JobIndex
+    masked_skill_cooc: cooc.MaskedSkillCooccurrence
+
+
+def accessibility() -> Optional[Accessibility]:
+    if not config.ACCESSIBILITY:
+        return None
+    # Imported here since the neo4j driver is only needed for accessibility.
+    from oplc_etl.pipelines import neo4j
+
+    data = neo4j.get_data(
+            sparse=config.ACCESSIBILITY_SPARSE,
+            columns={
+                "jobs": ["title", "level", "sector"],
+                "skills": ["title"],
+                "sectors": ["title"],
+                },
+            )
+    jobs = cooc.mk_jobs(data.jobs)
+    jobs_skills = cooc.mk_jobs_skills(data.jobs_skills,
+                                      sparse=config.ACCESSIBILITY_SPARSE)
+    skill_cooc = cooc.skill_cooccurrence(jobs_skills)
+    return Accessibility(
+            jobs=jobs,
+            skills=cooc.mk_skills(data.skills),
+            sectors=cooc.mk_sectors(data.sectors),
+            jobs_skills=jobs_skills,
+            job_index=cooc.mk_job_index(jobs, jobs_skills),
+            masked_skill_cooc=cooc.mk_masked_skill_cooccurrence(skill_cooc),
+            )
+
 
 @dataclass
 class Model:
     experiences_skills: core.ExperiencesSkills
     jobs_skills: core.JobsSkills
-    jobs: dict[core.JobId, core.Job]
-    skills: dict[core.SkillId, core.Skill]
-    experiences: dict[core.ExperienceId, core.Experience]
+    jobs: Catalog[core.Job]
+    skills: Catalog[core.Skill]
+    experiences: Catalog[core.Experience]
+    # Incremented on each data update, it identifies the data set in cache
+    # keys, along with the hash of its content.
+    dataset_version: int
+    dataset_hash: str
+    skill_score_cache: core.SkillScoreCache
+    response_cache: ResponseCache
+    # Ready to send /experiences, /jobs and /skills responses, rendered once
+    # per data set version, on the first request, see catalog_payload.
+    catalog_payloads: dict[str, CachedResponse]
+    layout_engine: LayoutEngine
+    skill_map: Optional[core.SkillMap]
+    # None when the accessibility endpoints are disabled. The referential
+    # comes from neo4j and is kept when the spreadsheets are pulled again.
+    accessibility: Optional[Accessibility]
 
 
-def init() -> Model:
+def skill_map(
+        experiences_skills: core.ExperiencesSkills,
+        layout_engine: LayoutEngine,
+        positions: Optional[dict[core.SkillId, npt.NDArray[np.float64]]] = None,
+        ) -> Optional[core.SkillMap]:
+    if not config.SKILL_MAP:
+        return None
+    if positions is not None:
+        return core.SkillMap(positions=positions,
+                             relaxation_steps=config.SKILL_MAP_RELAXATION_STEPS)
+    # The map is laid out once per data set, without the time budget of a
+    # request.
+    return core.mk_skill_map(
+            experiences_skills,
+            replace(layout_engine, budget=None),
+            relaxation_steps=config.SKILL_MAP_RELAXATION_STEPS,
+            )
+
+
+_catalog_payloads_lock = Lock()
+
+
+def catalog_payload(m: Model, name: str) -> CachedResponse:
+    """The /experiences, /jobs or /skills response of the model."""
+    # Imported here since src.view depends on this module.
+    from src import view
+
+    renderers = {
+            "experiences": view.experiences_json,
+            "jobs": view.jobs_json,
+            "skills": view.skills_json,
+            }
+    with _catalog_payloads_lock:
+        if name not in m.catalog_payloads:
+            m.catalog_payloads[name] = http_cache.payload(
+                    http_cache.etag(name, m.dataset_version, m.dataset_hash),
+                    renderers[name](m),
+                    compress=config.CATALOG_GZIP,
+                    )
+        return m.catalog_payloads[name]
+
+
+def mk_layout_engine() -> LayoutEngine:
+    return LayoutEngine(
+            algorithm=config.LAYOUT_ALGORITHM, # type:ignore
+            fallback=config.LAYOUT_FALLBACK, # type:ignore
+            budget=config.LAYOUT_BUDGET_SECONDS,
+            executor=(ThreadPoolExecutor(config.LAYOUT_WORKERS)
+                      if config.LAYOUT_WORKERS > 0 else None),
+            )
+
+
+def mk_model(
+        experiences_skills_df: pa.DataFrame,
+        jobs_skills_df: pa.DataFrame,
+        jobs: dict[int, str],
+        skills: dict[int, str],
+        experiences: dict[int, tuple[str, str]],
+        dataset_version: int,
+        layout_engine: LayoutEngine,
+        accessibility: Optional[Accessibility],
+        dataset_hash: Optional[str] = None,
+        skill_map_positions: Optional[dict[core.SkillId, npt.NDArray[np.float64]]] = None,
+        ) -> Model:
+    """A model with all its derived data, built from scratch.
+
+    The model is only installed once complete, so requests never see a
+    partially updated model. The data set hash is computed unless given, the
+    skill map is laid out unless its positions are given.
+    """
+    experiences_skills = core.mk_experiences_skills(experiences_skills_df)
+    jobs_skills = core.mk_jobs_skills(jobs_skills_df)
+    job_catalog = mk_catalog(core.mk_jobs(jobs))
+    skill_catalog = mk_catalog(core.mk_skills(skills))
+    experience_catalog = mk_catalog(core.mk_experiences(experiences))
     return Model(
-        experiences_skills=core.mk_experiences_skills(etl.experiences_skills()),
-        jobs_skills=core.mk_jobs_skills(etl.jobs_skills()),
-        jobs=core.mk_jobs(etl.jobs()),
-        skills=core.mk_skills(etl.skills()),
-        experiences=core.mk_experiences(etl.experiences()),
+        experiences_skills=experiences_skills,
+        jobs_skills=jobs_skills,
+        jobs=job_catalog,
+        skills=skill_catalog,
+        experiences=experience_catalog,
+        dataset_version=dataset_version,
+        dataset_hash=(dataset_hash if dataset_hash is not None
+                      else core.dataset_hash(experiences_skills, jobs_skills,
+                                             job_catalog, skill_catalog,
+                                             experience_catalog)),
+        skill_score_cache=core.SkillScoreCache(),
+        response_cache=ResponseCache(),
+        layout_engine=layout_engine,
+        skill_map=skill_map(experiences_skills, layout_engine,
+                            skill_map_positions),
+        accessibility=accessibility,
+        catalog_payloads={},
         )
 
 
+def init() -> Model:
+    # Starting from a snapshot avoids parsing the csv files and downloading the
+    # spreadsheets, see src.snapshot.
+    if config.MODEL_SNAPSHOT is not None:
+        path = Path(config.MODEL_SNAPSHOT)
+        if path.exists():
+            s = snapshot.read_snapshot(path)
+            if config.SKILL_MAP and s.skill_map is None:
+                logging.warning(f"Model snapshot {path} has no skill map, laying it out")
+            return mk_model(
+                    s.experiences_skills,
+                    s.jobs_skills,
+                    s.jobs,
+                    s.skills,
+                    s.experiences,
+                    dataset_version=0,
+                    layout_engine=mk_layout_engine(),
+                    accessibility=accessibility(),
+                    dataset_hash=s.dataset_hash,
+                    skill_map_positions=s.skill_map,
+                    )
+        logging.warning(f"Model snapshot {path} not found, loading the data sets")
+
+    return mk_model(
+            etl.experiences_skills(),
+            etl.jobs_skills(),
+            etl.jobs(),
+            etl.skills(),
+            etl.experiences(),
+            dataset_version=0,
+            layout_engine=mk_layout_engine(),
+            accessibility=accessibility(),
+            )
+
+
 def get() -> Model:
     global model
     return model
@@ -41,14 +234,18 @@ def present(act: action.Action) -> Model:
     global model
 
     if isinstance(act, action.DataFrameUpdate):
-        set_es = lens.experiences_skills.set(
-                core.mk_experiences_skills(act.experiences_skills_df))
-        set_js = lens.jobs_skills.set(
-                core.mk_jobs_skills(act.jobs_skills_df))
-
-        m = model
-        m = set_js(m)
-        m = set_es(m)
+        # The new model is built aside and installed with a single assignment.
+        # Requests in progress keep using the previous one.
+        m = mk_model(
+                act.experiences_skills_df,
+                act.jobs_skills_df,
+                act.jobs,
+                act.skills,
+                act.experiences,
+                dataset_version=model.dataset_version + 1,
+                layout_engine=model.layout_engine,
+                accessibility=model.accessibility,
+                )
         model = m
 
     else:
@@ -0,0 +1,79 @@
+"""Background data refresh.
+
+Pulling the data sources and building the new model is slow: it downloads the
+spreadsheets, parses them and computes all the derived data. A refresh runs as
+a job on a background thread, and the new model is installed by
+model.present once complete. Refresh requests made while a job is pending or
+running share that job instead of starting another one.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import Callable, Literal, Optional
+from uuid import uuid4
+
+from src import action, model
+
+RefreshStatus = Literal["running", "succeeded", "failed"]
+
+
+@dataclass
+class RefreshJob:
+    id: str
+    status: RefreshStatus
+    started: datetime
+    finished: Optional[datetime] = None
+    dataset_version: Optional[int] = None
+    error: Optional[str] = None
+
+
+class Refresher:
+
+    def __init__(
+            self,
+            on_installed: Callable[[], None] = lambda: None,
+            history_size: int = 16,
+            ):
+        self.on_installed = on_installed
+        self.history_size = history_size
+        self._jobs: dict[str, RefreshJob] = {}
+        self._current: Optional[RefreshJob] = None
+        self._lock = Lock()
+
+    def request(self) -> RefreshJob:
+        """Start a refresh job, or return the one already running."""
+        with self._lock:
+            if self._current is not None:
+                return self._current
+
+            job = RefreshJob(id=uuid4().hex, status="running",
+                             started=datetime.now(timezone.utc))
+            self._current = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history_size:
+                del self._jobs[next(iter(self._jobs))]
+
+        Thread(target=self._run, args=(job,), daemon=True).start()
+        return job
+
+    def _run(self, job: RefreshJob) -> None:
+        status: RefreshStatus
+        try:
+            m = model.present(action.pull_data_source())
+            self.on_installed()
+            job.dataset_version = m.dataset_version
+            status = "succeeded"
+        except Exception as e:
+            logging.exception("Data refresh failed")
+            job.error = f"{type(e).__name__}: {e}"
+            status = "failed"
+
+        with self._lock:
+            job.finished = datetime.now(timezone.utc)
+            job.status = status
+            self._current = None
+
+    def get(self, job_id: str) -> Optional[RefreshJob]:
+        return self._jobs.get(job_id)
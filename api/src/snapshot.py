@@ -0,0 +1,219 @@
+"""Binary snapshot of the model data.
+
+Building the model from the ETL parses the cached csv files several times, and
+downloads the spreadsheets on a cold start. A snapshot holds the id maps, the
+experiences × skills and jobs × skills matrices, the positions of the skill map
+and the data set hash in a single file. The matrices are memory mapped on load,
+so that starting the API from a snapshot mostly costs building the indexes.
+
+File layout:
+- the magic bytes MAGIC,
+- the length of the header, as a little endian unsigned 64 bits integer,
+- the header, in JSON, with the id maps, the data set hash and, for each
+  matrix, its dtype, shape, row and column labels, and the offset of its data
+  from the start of the data section. The skill map is stored as a skills × 2
+  matrix of positions, when SKILL_MAP is enabled,
+- the data section, starting after the header, with the matrices in C order.
+  The data section and each matrix are aligned on ALIGNMENT bytes.
+
+Build a snapshot from the ETL output, with the environment of the API since the
+skill map is laid out with its layout settings, with:
+
+    python -m src.snapshot snapshot.bin
+"""
+
+import argparse
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pa
+import numpy.typing as npt
+import oplc_model.model_job_skill_graph as core
+from oplc_model.layout import LayoutEngine
+from oplc_etl.pipelines import google_spreadsheet as etl
+from src import config
+
+MAGIC = b"OPLCSNP1"
+ALIGNMENT = 64
+
+_MATRICES = ("experiences_skills", "jobs_skills")
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    experiences_skills: pa.DataFrame
+    jobs_skills: pa.DataFrame
+    jobs: dict[int, str]
+    skills: dict[int, str]
+    experiences: dict[int, tuple[str, str]]
+    dataset_hash: str
+    skill_map: Optional[dict[int, npt.NDArray[np.float64]]] = None
+
+
+def _align(n: int) -> int:
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def _compact(matrix: np.ndarray) -> np.ndarray:
+    # The matrices hold small counts, mostly 0 and 1, they are stored on one
+    # byte when they fit.
+    if matrix.dtype.kind in "iub" and (matrix.size == 0 or (
+            matrix.min() >= 0 and matrix.max() <= np.iinfo(np.uint8).max)):
+        return matrix.astype(np.uint8)
+    return matrix
+
+
+def mk_snapshot(
+        experiences_skills: pa.DataFrame,
+        jobs_skills: pa.DataFrame,
+        jobs: dict[int, str],
+        skills: dict[int, str],
+        experiences: dict[int, tuple[str, str]],
+        skill_map: Optional[dict[int, npt.NDArray[np.float64]]] = None,
+        ) -> Snapshot:
+    frames = {
+            name: pa.DataFrame(_compact(df.to_numpy()), index=df.index,
+                               columns=df.columns)
+            for name, df in zip(_MATRICES, (experiences_skills, jobs_skills))
+            }
+    return Snapshot(
+            **frames,
+            jobs=jobs,
+            skills=skills,
+            experiences=experiences,
+            # Hashed as src.model.mk_model does, from the stored matrices.
+            dataset_hash=core.dataset_hash(
+                core.mk_experiences_skills(frames["experiences_skills"]),
+                core.mk_jobs_skills(frames["jobs_skills"]),
+                core.mk_jobs(jobs),
+                core.mk_skills(skills),
+                core.mk_experiences(experiences),
+                ),
+            skill_map=skill_map,
+            )
+
+
+def write_snapshot(snapshot: Snapshot, path: Path) -> None:
+    """Write the snapshot, replacing the file at path atomically."""
+    frames = {name: getattr(snapshot, name) for name in _MATRICES}
+    if snapshot.skill_map is not None:
+        frames["skill_map"] = pa.DataFrame.from_dict(
+                snapshot.skill_map, orient="index", dtype=np.float64)
+    matrices = {name: np.ascontiguousarray(df.to_numpy())
+                for name, df in frames.items()}
+
+    arrays: dict[str, dict[str, Any]] = {}
+    offset = 0
+    for name, matrix in matrices.items():
+        df = frames[name]
+        arrays[name] = {
+                "dtype": matrix.dtype.str,
+                "shape": list(matrix.shape),
+                "offset": offset,
+                "index": df.index.tolist(),
+                "columns": df.columns.tolist(),
+                }
+        offset = _align(offset + matrix.nbytes)
+
+    header = json.dumps({
+        "created": datetime.now(timezone.utc).isoformat(),
+        "dataset_hash": snapshot.dataset_hash,
+        "jobs": list(snapshot.jobs.items()),
+        "skills": list(snapshot.skills.items()),
+        "experiences": [(i, n, t) for i, (n, t) in snapshot.experiences.items()],
+        "arrays": arrays,
+        }).encode()
+
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, matrix in matrices.items():
+            f.seek(data_start + arrays[name]["offset"])
+            f.write(matrix.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+def read_snapshot(path: Path) -> Snapshot:
+    """Read a snapshot, the matrices are read-only memory maps of the file."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a model snapshot")
+        header_size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_size))
+
+    data_start = _align(len(MAGIC) + 8 + header_size)
+
+    frames = {}
+    for name in header["arrays"]:
+        a = header["arrays"][name]
+        shape = tuple(a["shape"])
+        if 0 in shape:
+            # Empty arrays can't be memory mapped.
+            matrix = np.empty(shape, dtype=a["dtype"])
+        else:
+            matrix = np.memmap(path, dtype=a["dtype"], mode="r",
+                               offset=data_start + a["offset"], shape=shape)
+        frames[name] = pa.DataFrame(matrix, index=a["index"],
+                                    columns=a["columns"], copy=False)
+
+    skill_map = frames.pop("skill_map", None)
+    return Snapshot(
+            **frames,
+            jobs={i: n for i, n in header["jobs"]},
+            skills={i: n for i, n in header["skills"]},
+            experiences={i: (n, t) for i, n, t in header["experiences"]},
+            dataset_hash=header["dataset_hash"],
+            skill_map=(None if skill_map is None
+                       else dict(zip(skill_map.index, np.array(skill_map)))),
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+            description="Build a model snapshot from the ETL output.")
+    parser.add_argument("output", type=Path, help="snapshot file to write")
+    parser.add_argument("--pull", action="store_true",
+                        help="download the data sources again first")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+    if args.pull:
+        etl.pull_sources()
+
+    experiences_skills = etl.experiences_skills()
+    skill_map = None
+    if config.SKILL_MAP:
+        # Laid out like src.model.skill_map does, without a time budget.
+        skill_map = core.mk_skill_map(
+                core.mk_experiences_skills(experiences_skills),
+                LayoutEngine(
+                    algorithm=config.LAYOUT_ALGORITHM, # type:ignore
+                    fallback=config.LAYOUT_FALLBACK, # type:ignore
+                    ),
+                ).positions
+
+    snapshot = mk_snapshot(
+            experiences_skills,
+            etl.jobs_skills(),
+            etl.jobs(),
+            etl.skills(),
+            etl.experiences(),
+            skill_map=skill_map,
+            )
+    write_snapshot(snapshot, args.output)
+    logging.info(f"Wrote snapshot of data set {snapshot.dataset_hash} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
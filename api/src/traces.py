@@ -0,0 +1,84 @@
+"""Per request timings and slow request traces.
+
+The stages of a request, recorded by the model functions in a trace (see
+oplc_model.metrics), are sent back in a Server-Timing header. Requests slower
+than a threshold are sampled to a local trace file, rotated by size. Each line
+of the file is a JSON object with the inputs of the request, the data set
+version and the stage durations, so that the request can be replayed offline
+with oplc_model.
+"""
+
+import json
+import logging
+import random
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Optional
+
+from oplc_model.metrics import Trace
+
+
+def server_timing(trace: Trace, total: float) -> str:
+    """Server-Timing header value, durations in milliseconds.
+
+    The durations of stages recorded several times are summed.
+
+    >>> server_timing(Trace(stages=[("layout", 0.002), ("centrality", 0.01),
+    ...                             ("layout", 0.001)]), 0.02)
+    'layout;dur=3.0, centrality;dur=10.0, total;dur=20.0'
+    """
+    durations: dict[str, float] = {}
+    for name, duration in trace.stages:
+        durations[name] = durations.get(name, 0.0) + duration
+    durations["total"] = total
+    return ", ".join(f"{name};dur={1000 * d:.1f}" for name, d in durations.items())
+
+
+class SlowRequestLog:
+
+    def __init__(
+            self,
+            path: Optional[Path],
+            threshold: float,
+            sample_rate: float,
+            max_bytes: int,
+            backups: int,
+            ):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self._logger: Optional[logging.Logger] = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # The file is only opened on the first trace.
+            handler = RotatingFileHandler(path, maxBytes=max_bytes,
+                                          backupCount=backups, delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"{__name__}.{path}")
+            self._logger.addHandler(handler)
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+
+    def record(
+            self,
+            trace: Trace,
+            total: float,
+            request: dict[str, Any],
+            ) -> bool:
+        """Write the trace if the request is slow and sampled.
+
+        `request` holds the inputs of the request, they must be JSON
+        serializable.
+        """
+        if self._logger is None or total < self.threshold \
+                or random.random() >= self.sample_rate:
+            return False
+
+        self._logger.info(json.dumps({
+            "time": datetime.now(timezone.utc).isoformat(),
+            "total": total,
+            "request": request,
+            "stages": trace.stages,
+            **trace.attributes,
+            }))
+        return True
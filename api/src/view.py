@@ -3,12 +3,19 @@
 
 from pydantic import BaseModel
 
-from oplc_model import model as core
-from src.model import Model
+from oplc_model import model_job_skill_graph as core
+from oplc_model import model_skill_cooc as cooc
+from oplc_model import metrics
+from src.model import Accessibility, Model
+from src.refresh import RefreshJob
 import numpy as np
+import pandas as pa
 import networkx as nx
 
-from typing import Tuple, Optional, Callable
+from typing import Tuple, Optional, Callable, Iterable
+from datetime import date, datetime
+from dataclasses import replace
+from concurrent.futures import Executor
 
 
 JobIdJson = str
@@ -33,6 +40,19 @@ def experience_id_from_json(experience_id: ExperienceIdJson) -> core.ExperienceI
     return int(experience_id)
 
 
+def unknown_experiences(
+        model: Model,
+        experiences: Iterable[ExperienceIdJson],
+        ) -> list[ExperienceIdJson]:
+    """The experience ids that are not in the model, in order."""
+    def known(e: ExperienceIdJson) -> bool:
+        try:
+            return experience_id_from_json(e) in model.experiences
+        except ValueError:
+            return False
+    return [e for e in experiences if not known(e)]
+
+
 
 class ExperienceJson(BaseModel):
     name: str
@@ -45,6 +65,27 @@ def experiences_json(model: Model) -> dict[ExperienceIdJson, ExperienceJson]:
             }
 
 
+class ExperienceSearchResultJson(BaseModel):
+    id: ExperienceIdJson
+    name: str
+    exp_type: str
+
+
+def experience_search_json(
+        model: Model,
+        query: str,
+        limit: int,
+        ) -> list[ExperienceSearchResultJson]:
+    return [
+        ExperienceSearchResultJson(
+            id=experience_id_json(i),
+            name=model.experiences[i].name,
+            exp_type=model.experiences[i].exp_type,
+            )
+        for i in model.experiences.search(query, limit)
+        ]
+
+
 class SkillJson(BaseModel, frozen=True):
     name: str
 
@@ -109,7 +150,7 @@ def job_recommendation_json(
         model: Model,
         experiences: list[ExperienceIdJson],
         return_graph: bool,
-        skill_centrality_measure: Callable[[nx.Graph], float]
+        skill_centrality_measure: Callable[[nx.Graph], dict[core.SkillId, float]]
         ) -> JobRecommendationJson:
     jr = core.job_recommendation(
                 model.experiences_skills,
@@ -117,17 +158,360 @@ def job_recommendation_json(
                 [experience_id_from_json(e) for e in experiences],
                 return_graph=return_graph,
                 skill_centrality_measure=skill_centrality_measure,
+                cache=model.skill_score_cache,
+                dataset_version=model.dataset_version,
+                layout_engine=(model.layout_engine if model.skill_map is None
+                               else model.skill_map),
                 )
-    scores = [
-        JobWithScoreJson(job=job_json(model.jobs[j]), score=s)
-        for j, s in jr.items()
+    with metrics.stage("view"):
+        scores = [
+            JobWithScoreJson(job=job_json(model.jobs[j]), score=s)
+            for j, s in jr.items()
+            ]
+
+        if jr.skill_graph is not None:
+            graph = skill_graph_json(jr.skill_graph)
+        else:
+            graph = None
+
+        return JobRecommendationJson(scores=scores, skill_graph=graph)
+
+
+# Batch recommendations are returned in a compact form: for each experience
+# set, given by its index in the request, the ids of the recommended jobs and
+# their scores, in the same order.
+
+class JobRecommendationBatchItemJson(BaseModel):
+    index: int
+    jobs: list[JobIdJson]
+    scores: list[float]
+
+
+class JobRecommendationBatchJson(BaseModel):
+    items: list[JobRecommendationBatchItemJson]
+
+
+def job_recommendation_batch_json(
+        model: Model,
+        experience_sets: list[list[ExperienceIdJson]],
+        first_index: int,
+        skill_centrality_measure: Callable[[nx.Graph], dict[core.SkillId, float]],
+        limit: Optional[int],
+        executor: Optional[Executor],
+        ) -> list[JobRecommendationBatchItemJson]:
+    recommendations = core.job_recommendation_batch(
+            model.experiences_skills,
+            model.jobs_skills,
+            [[experience_id_from_json(e) for e in es] for es in experience_sets],
+            skill_centrality_measure=skill_centrality_measure,
+            cache=model.skill_score_cache,
+            dataset_version=model.dataset_version,
+            executor=executor,
+            )
+    return [
+        JobRecommendationBatchItemJson(
+            index=first_index + k,
+            jobs=[job_id_json(j) for j in jr.scores.index[:limit]],
+            scores=jr.scores.iloc[:limit].tolist(),
+            )
+        for k, jr in enumerate(recommendations)
         ]
 
-    if jr.skill_graph is not None:
-        graph = skill_graph_json(jr.skill_graph)
-    else:
-        graph = None
 
-    return JobRecommendationJson(scores=scores, skill_graph=graph)
+class RefreshJobJson(BaseModel):
+    id: str
+    status: str
+    started: datetime
+    finished: Optional[datetime]
+    dataset_version: Optional[int]
+    error: Optional[str]
 
 
+def refresh_job_json(job: RefreshJob) -> RefreshJobJson:
+    return RefreshJobJson(
+            id=job.id,
+            status=job.status,
+            started=job.started,
+            finished=job.finished,
+            dataset_version=job.dataset_version,
+            error=job.error,
+            )
+
+
+# Accessibility. Jobs, skills and sectors are those of the neo4j referential,
+# their ids are not the ids of /jobs and /skills.
+
+ReferentialJobIdJson = str
+ReferentialSkillIdJson = str
+SectorIdJson = str
+
+
+class IndividualExperienceJson(BaseModel):
+    job: ReferentialJobIdJson
+    begin: date
+    end: date
+
+
+class IndividualJson(BaseModel):
+    experiences: list[IndividualExperienceJson]
+    # Replace the main job, main sector and level deduced from the experiences.
+    main_job: Optional[ReferentialJobIdJson] = None
+    main_sector: Optional[SectorIdJson] = None
+    level: Optional[int] = None
+
+
+def referential_ids(
+        ids: list[str],
+        name: str,
+        known: pa.Index,
+        ) -> list[int]:
+    """The ids as integers, raises ValueError on ids that are not in known.
+
+    >>> referential_ids(["1", "2"], "jobs", pa.Index([1, 2]))
+    [1, 2]
+    >>> referential_ids(["1", "x", "3"], "jobs", pa.Index([1, 2]))
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown jobs: ['x', '3']
+    """
+    unknown = [i for i in ids if not i.isdecimal() or int(i) not in known]
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown {name}: {unknown}")
+    return [int(i) for i in ids]
+
+
+def individual_model(
+        accessibility: Accessibility,
+        individual: IndividualJson,
+        ) -> cooc.Model:
+    """The model of the individual, raises ValueError on unknown ids."""
+    if len(individual.experiences) == 0:
+        raise ValueError("At least one experience is required")
+    job_ids = referential_ids(
+            [e.job for e in individual.experiences]
+            + ([individual.main_job] if individual.main_job is not None else []),
+            "jobs",
+            accessibility.jobs.index,
+            )
+    sector_ids = referential_ids(
+            [individual.main_sector] if individual.main_sector is not None else [],
+            "sectors",
+            accessibility.sectors.index,
+            )
+
+    m = cooc.model(
+            cooc.mk_individual_experiences(
+                job_ids[:len(individual.experiences)],
+                [e.begin for e in individual.experiences],
+                [e.end for e in individual.experiences],
+                ),
+            accessibility.jobs,
+            accessibility.jobs_skills,
+            job_index=accessibility.job_index,
+            )
+    if individual.main_job is not None:
+        m = replace(m, main_job=job_ids[-1])
+    if individual.main_sector is not None:
+        m = replace(m, main_sector=sector_ids[0])
+    if individual.level is not None:
+        m = replace(m, level=individual.level)
+    return m
+
+
+class ExperienceWeightJson(BaseModel):
+    job: ReferentialJobIdJson
+    begin: date
+    end: date
+    duration: float
+    recency: float
+    weight: float
+
+
+class IndividualModelJson(BaseModel):
+    experiences: list[ExperienceWeightJson]
+    # Skills with a positive weight, highest weight first.
+    skills: list[Tuple[ReferentialSkillIdJson, float]]
+    main_job: ReferentialJobIdJson
+    main_sector: SectorIdJson
+    level: int
+
+
+def individual_model_json(
+        accessibility: Accessibility,
+        individual: IndividualJson,
+        ) -> IndividualModelJson:
+    m = individual_model(accessibility, individual)
+    skills = m.skills.weight.loc[lambda x: x > 0].sort_values(ascending=False)
+    return IndividualModelJson(
+            experiences=[
+                ExperienceWeightJson(job=str(e.job_id), begin=e.begin, end=e.end,
+                                     duration=e.duration, recency=e.recency,
+                                     weight=e.weight)
+                for e in m.experiences.itertuples()
+                ],
+            skills=[(str(s), w) for s, w in skills.items()],
+            main_job=str(m.main_job),
+            main_sector=str(m.main_sector),
+            level=int(m.level),
+            )
+
+
+class JobAccessibilityItemJson(BaseModel):
+    job: ReferentialJobIdJson
+    title: str
+    accessibility: float
+    # Only given when weighing by level difference.
+    level_diff_weight: Optional[float]
+    # Skills of the individual required by the job, largest contribution first.
+    contributing_skills: list[ReferentialSkillIdJson]
+    # Skills required by the job that the individual lacks.
+    missing_skills: list[ReferentialSkillIdJson]
+
+
+def job_accessibility_json(
+        accessibility: Accessibility,
+        individual: IndividualJson,
+        same_sector_first: bool,
+        hide_practiced_jobs: bool,
+        weigh_by_level_diff: bool,
+        show_level_min: int,
+        show_level_max: int,
+        limit: int,
+        ) -> list[JobAccessibilityItemJson]:
+    ja = cooc.job_accessibility(
+            individual_model(accessibility, individual),
+            accessibility.jobs,
+            accessibility.jobs_skills,
+            same_sector_first,
+            hide_practiced_jobs,
+            weigh_by_level_diff,
+            show_level_min,
+            show_level_max,
+            job_index=accessibility.job_index,
+            top_k=limit,
+            )
+    return [
+        JobAccessibilityItemJson(
+            job=str(j),
+            title=accessibility.jobs.loc[j, "title"],
+            accessibility=a,
+            level_diff_weight=(ja.level_diff_weights.loc[j]
+                               if ja.level_diff_weights is not None else None),
+            contributing_skills=[
+                str(s) for s in ja.skill_contribution.loc[j, :]
+                .sort_values(ascending=False).loc[lambda x: x > 0].index
+                ],
+            missing_skills=[
+                str(s) for s in ja.skill_gap.loc[j, :]
+                .sort_values(ascending=False).loc[lambda x: x >= 1.0].index
+                ],
+            )
+        for j, a in ja.job_accessibility.iloc[:limit].items()
+        ]
+
+
+class SkillAccessibilityItemJson(BaseModel):
+    skill: ReferentialSkillIdJson
+    title: str
+    accessibility: float
+    # Skills of the individual co-occurring with the skill, largest
+    # contribution first.
+    contributing_skills: list[ReferentialSkillIdJson]
+
+
+def skill_accessibility_json(
+        accessibility: Accessibility,
+        individual: IndividualJson,
+        skills: Optional[list[ReferentialSkillIdJson]],
+        limit: int,
+        ) -> list[SkillAccessibilityItemJson]:
+    """The limit most accessible skills, among the given skills if any."""
+    if skills is None:
+        explained = None
+    else:
+        explained = pa.Index(referential_ids(
+                skills, "skills", accessibility.masked_skill_cooc.skill_ids)).unique()
+
+    sa = cooc.skill_accessibility(
+            individual_model(accessibility, individual),
+            masked_skill_cooc=accessibility.masked_skill_cooc,
+            explained_skills=explained,
+            top_n=limit if explained is None else None,
+            )
+    if explained is None:
+        shown = sa.skill_contribution.index
+    else:
+        shown = (sa.skill_accessibility.loc[explained]
+                 .sort_values(ascending=False, kind="stable").index[:limit])
+    return [
+        SkillAccessibilityItemJson(
+            skill=str(s),
+            title=accessibility.skills.loc[s, "title"],
+            accessibility=sa.skill_accessibility.loc[s],
+            contributing_skills=[
+                str(c) for c in sa.skill_contribution.loc[s, :]
+                .sort_values(ascending=False).loc[lambda x: x > 0].index
+                ],
+            )
+        for s in shown
+        ]
+
+
+class SkillPotentialItemJson(BaseModel):
+    skill: ReferentialSkillIdJson
+    title: str
+    potential: float
+    # Jobs whose accessibility increases with the skill, largest increase
+    # first.
+    jobs: list[ReferentialJobIdJson]
+
+
+def skill_potential_json(
+        accessibility: Accessibility,
+        individual: IndividualJson,
+        same_sector_first: bool,
+        hide_practiced_jobs: bool,
+        weigh_by_level_diff: bool,
+        weigh_by_job_accessibility: bool,
+        show_level_min: int,
+        show_level_max: int,
+        limit: int,
+        jobs_limit: int,
+        ) -> list[SkillPotentialItemJson]:
+    m = individual_model(accessibility, individual)
+    # The potential only needs the accessibility of all the shown jobs, not
+    # the explanation of the most accessible ones.
+    ja = cooc.job_accessibility(
+            m,
+            accessibility.jobs,
+            accessibility.jobs_skills,
+            same_sector_first,
+            hide_practiced_jobs,
+            weigh_by_level_diff,
+            show_level_min,
+            show_level_max,
+            job_index=accessibility.job_index,
+            top_k=1,
+            )
+    potential = cooc.skill_potential(
+            m,
+            accessibility.jobs_skills,
+            ja,
+            weigh_by_level_diff,
+            weigh_by_job_accessibility,
+            job_index=accessibility.job_index,
+            top_n=limit,
+            )
+    return [
+        SkillPotentialItemJson(
+            skill=str(s),
+            title=accessibility.skills.loc[s, "title"],
+            potential=p,
+            jobs=[
+                str(j) for j in potential.per_job.loc[s, :]
+                .sort_values(ascending=False).loc[lambda x: x > 0]
+                .index[:jobs_limit]
+                ],
+            )
+        for s, p in potential.average.dropna().items()
+        ]
@@ -0,0 +1,134 @@
+import os
+import numpy as np
+import pandas as pa
+from pathlib import Path
+from typing import Optional
+
+
+# The local caches are stored in a columnar numpy .npz archive, with compact
+# types, rather than as csv files:
+# - the columns of the skill matrices, given by the caller, are stored
+#   together in a single uint8 matrix when they hold integers from 0 to 255,
+# - the other numeric columns, like levels, are stored as is: compact integer
+#   types would overflow in computations,
+# - the other columns, like titles, are stored as categoricals: the distinct
+#   values and the integer code of each row,
+# - the row index and the column labels are stored with their own types.
+# Arrays of an archive are read on access, so reading some of the columns
+# doesn't read the others. All the indicator columns are read at once though.
+
+def _fits_matrix(column: pa.Series) -> bool:
+    return (pa.api.types.is_integer_dtype(column) or pa.api.types.is_bool_dtype(column)) \
+            and bool(((column >= 0) & (column <= np.iinfo(np.uint8).max)).all())
+
+
+def _labels(labels: pa.Index) -> np.ndarray:
+    # Text labels are stored as fixed size unicode, which doesn't need pickle.
+    a = np.asarray(labels)
+    return a.astype(str) if a.dtype.kind not in "iuf" else a
+
+
+def write_columnar(
+        df: pa.DataFrame,
+        path: Path,
+        metadata: Optional[dict[str, str]] = None,
+        matrix_columns: Optional[list] = None,
+        ) -> None:
+    """Write the data frame to the .npz archive at path, with metadata.
+
+    The columns of `matrix_columns` are stored in the uint8 matrix, unless one
+    of them holds other values than integers from 0 to 255.
+
+    >>> import tempfile
+    >>> df = pa.DataFrame({"title": ["a", "b", "a"], "level": [3, 4, 3],
+    ...                    "s1": [0, 1, 1], "s2": [1, 0, 0]},
+    ...                   index=pa.Index([10, 11, 12], name="job"))
+    >>> with tempfile.TemporaryDirectory() as d:
+    ...     write_columnar(df, Path(d) / "jobs.npz", {"version": "1"}, ["s1", "s2"])
+    ...     read = read_columnar(Path(d) / "jobs.npz")
+    ...     titles = read_columnar(Path(d) / "jobs.npz", columns=["title"])
+    ...     metadata = read_metadata(Path(d) / "jobs.npz")
+    >>> read.index.name, read.index.tolist(), read.to_dict("list")
+    ('job', [10, 11, 12], {'title': ['a', 'b', 'a'], 'level': [3, 4, 3], 's1': [0, 1, 1], 's2': [1, 0, 0]})
+    >>> read.dtypes.astype(str).tolist(), titles.columns.tolist(), metadata
+    (['category', 'int64', 'uint8', 'uint8'], ['title'], {'version': '1'})
+    """
+    in_matrix = [df.columns.get_loc(c) for c in (matrix_columns or [])]
+    if not all(_fits_matrix(df.iloc[:, k]) for k in in_matrix):
+        in_matrix = []
+    numeric = [k for k in range(df.shape[1]) if k not in in_matrix
+               and pa.api.types.is_numeric_dtype(df.iloc[:, k])]
+    text = [k for k in range(df.shape[1])
+            if k not in in_matrix and k not in numeric]
+
+    arrays: dict[str, np.ndarray] = {
+            "columns": _labels(df.columns),
+            "index": _labels(df.index),
+            # Default positional index, as read from csv files
+            "range_index": np.array(isinstance(df.index, pa.RangeIndex)
+                                    and df.index.equals(pa.RangeIndex(len(df)))),
+            "index_name": np.array(df.index.name or ""),
+            "matrix_columns": np.array(in_matrix, dtype=np.int64),
+            "matrix": df.iloc[:, in_matrix].to_numpy(dtype=np.uint8),
+            }
+    for k in numeric:
+        arrays[f"values_{k}"] = df.iloc[:, k].to_numpy()
+    for k in text:
+        codes, categories = pa.factorize(df.iloc[:, k])
+        arrays[f"codes_{k}"] = codes.astype(np.int32)
+        arrays[f"categories_{k}"] = np.asarray(categories).astype(str)
+    for key, value in (metadata or {}).items():
+        arrays[f"metadata_{key}"] = np.array(value)
+
+    # Replaced atomically, since other processes may be reading the archive.
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def read_columnar(
+        path: Path,
+        columns: Optional[list] = None,
+        ) -> pa.DataFrame:
+    """The data frame stored at path, with only `columns` if given.
+
+    Raises a KeyError for columns that are not in the archive.
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        all_columns = archive["columns"].tolist()
+        if columns is not None:
+            missing = [c for c in columns if c not in all_columns]
+            if len(missing) > 0:
+                raise KeyError(f"{missing} not in {path}")
+        selected = (range(len(all_columns)) if columns is None
+                    else [all_columns.index(c) for c in columns])
+
+        # Position of each matrix column in the matrix
+        matrix_columns = {k: j for j, k in enumerate(archive["matrix_columns"].tolist())}
+        if any(k in matrix_columns for k in selected):
+            matrix = archive["matrix"]
+
+        data = {}
+        for k in selected:
+            if k in matrix_columns:
+                data[all_columns[k]] = matrix[:, matrix_columns[k]]
+            elif f"values_{k}" in archive.files:
+                data[all_columns[k]] = archive[f"values_{k}"]
+            else:
+                data[all_columns[k]] = pa.Categorical.from_codes(
+                        archive[f"codes_{k}"], archive[f"categories_{k}"])
+
+        index_name = str(archive["index_name"]) or None
+        if archive["range_index"]:
+            index = pa.RangeIndex(len(archive["index"]), name=index_name)
+        else:
+            index = pa.Index(archive["index"], name=index_name)
+
+    return pa.DataFrame(data, index=index, columns=[all_columns[k] for k in selected])
+
+
+def read_metadata(path: Path) -> dict[str, str]:
+    with np.load(path, allow_pickle=False) as archive:
+        return {key.removeprefix("metadata_"): str(archive[key])
+                for key in archive.files if key.startswith("metadata_")}
@@ -9,7 +9,9 @@ from typing import Tuple, TypeVar
 from datetime import datetime
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Union, Literal
+from typing import Union, Literal, Optional
+from threading import RLock
+from oplc_etl.columnar import read_columnar, read_metadata, write_columnar
 
 DATASET_CACHE_DIR = Path("/tmp/diagoriente-oplc/cache/data_set/")
 
@@ -34,7 +36,9 @@ JOBS_SKILLS_DATA_SOURCES = {
 DataPieceKind = Literal["experiences_skills", "jobs_skills"]
 
 # Each piece of data is stored locally as a csv file. Different versions are
-# stored with different filenames.
+# stored with different filenames. The csv file is converted on first load to
+# a columnar cache with compact types, see oplc_etl.columnar, which is read
+# instead until the data piece is pulled again.
 
 @dataclass
 class LocalCsv:
@@ -51,6 +55,15 @@ def local_csv_path(kind: DataPieceKind) -> Path:
 def local_csv_path_meta(kind: DataPieceKind) -> Path:
     return local_csv_dir(kind) / "meta.json"
 
+def local_columnar_path(kind: DataPieceKind) -> Path:
+    return local_csv_dir(kind) / "content.npz"
+
+# Columns of each data piece besides the skills.
+LABEL_COLUMNS: dict[DataPieceKind, list[str]] = {
+        "experiences_skills": ["Expérience", "type"],
+        "jobs_skills": ["Métier"],
+        }
+
 # A data source defines where to fetch a data piece, like a local csv file or a
 # remote google docs spreadsheet.
 
@@ -152,6 +165,15 @@ def pull_source(
     return load_local_csv(kind)
 
 
+def pull_sources() -> None:
+    """Download all the data sources again, replacing the local csv files."""
+    # Data pieces aren't loaded while their files are being replaced.
+    with _load_lock:
+        pull_source(experiences_skills_data_source, "experiences_skills",
+                    skip_if_exists=False)
+        pull_source(jobs_skills_data_source, "jobs_skills", skip_if_exists=False)
+
+
 def load_local_csv(kind: DataPieceKind):
     with open(local_csv_path_meta(kind), "r") as f:
         meta = json.loads(f.read())
@@ -162,71 +184,141 @@ def load_local_csv(kind: DataPieceKind):
                 )
 
 
-def load_data_frame(ds: LocalCsv) -> pa.DataFrame :
-    return pa.DataFrame(pa.read_csv(local_csv_path(ds.kind)))
+def load_data_frame(
+        ds: LocalCsv,
+        columns: Optional[list[str]] = None,
+        ) -> pa.DataFrame :
+    # The columnar cache is tagged with the date of the csv it was converted
+    # from. The skill columns are stored in its uint8 matrix.
+    path = local_columnar_path(ds.kind)
+    version = ds.date.isoformat()
+    if not path.exists() or read_metadata(path).get("version") != version:
+        df = pa.read_csv(local_csv_path(ds.kind))
+        write_columnar(df, path, {"version": version},
+                       matrix_columns=[c for c in df.columns
+                                       if c not in LABEL_COLUMNS[ds.kind]])
+    return read_columnar(path, columns)
+
+
+# Each data piece is parsed once per version, as identified by its meta.json,
+# and all the views below are derived from the parsed data frames. A data piece
+# is only parsed again after it has been pulled again, or when other columns
+# are needed: the experiences are only read with the skills of the jobs. The
+# data frames and views are shared between callers and must not be modified.
+
+@dataclass(frozen=True)
+class DataSet:
+    jobs: dict[int, str]
+    skills: dict[int, str]
+    experiences: dict[int, tuple[str, str]]
+    experiences_skills: pa.DataFrame
+    jobs_skills: pa.DataFrame
+
+
+_data_frames: dict[DataPieceKind, Tuple[LocalCsv, Optional[list[str]], pa.DataFrame]] = {}
+_data_set: Optional[Tuple[Tuple[LocalCsv, LocalCsv], DataSet]] = None
+_load_lock = RLock()
+
+
+def load(
+        ds: DataSource,
+        kind: DataPieceKind,
+        columns: Optional[list[str]] = None,
+        ) -> Tuple[LocalCsv, pa.DataFrame]:
+    """The data piece and its version, parsed if its version or the columns
+    changed. Only the given columns are read, all of them if None.
+    """
+    with _load_lock:
+        local = pull_source(ds, kind)
+        loaded = _data_frames.get(kind)
+        if loaded is None or loaded[0] != local or loaded[1] != columns:
+            loaded = (local, columns, load_data_frame(local, columns))
+            _data_frames[kind] = loaded
+        return loaded[0], loaded[2]
+
+
+def data_set() -> DataSet:
+    global _data_set
+
+    with _load_lock:
+        js_version, js_df = load(jobs_skills_data_source, "jobs_skills")
+        es_version, es_df = load(
+                experiences_skills_data_source,
+                "experiences_skills",
+                LABEL_COLUMNS["experiences_skills"] + [
+                    c for c in js_df.columns if c not in LABEL_COLUMNS["jobs_skills"]
+                    ],
+                )
+        if _data_set is None or _data_set[0] != (es_version, js_version):
+            _data_set = ((es_version, js_version), mk_data_set(es_df, js_df))
+        return _data_set[1]
+
+
+def mk_data_set(
+        experiences_skills_df: pa.DataFrame,
+        jobs_skills_df: pa.DataFrame,
+        ) -> DataSet:
+    skills = {i: s
+              for i, s in enumerate(
+                  jobs_skills_df.drop(columns=["Métier"])
+                  .columns # type:ignore
+                  )
+              }
+    skill_names = list(skills.values())
+    skill_ids = {x: i for i, x in skills.items()}
+
+    return DataSet(
+            jobs={i: j # type:ignore
+                  for i, j in enumerate(
+                      jobs_skills_df.loc[:, "Métier"], # type:ignore
+                      )
+                  },
+            skills=skills,
+            experiences={i: (exp, exp_type)
+                         for i, (exp, exp_type) in enumerate(
+                             experiences_skills_df
+                             .loc[:, ["Expérience", "type"]].values # type:ignore
+                             )
+                         },
+            experiences_skills=(experiences_skills_df
+                                .loc[:, skill_names]
+                                .rename(columns=skill_ids)),
+            jobs_skills=(jobs_skills_df
+                         .loc[:, skill_names]
+                         .rename(columns=skill_ids)),
+            )
 
 
 def experiences_skills_df():
-    return load_data_frame(pull_source(
-            experiences_skills_data_source,
-            "experiences_skills",
-            ))
+    return load(experiences_skills_data_source, "experiences_skills")[1]
 
 
 def jobs_skills_df() -> pa.DataFrame:
-    return load_data_frame(pull_source(
-            jobs_skills_data_source,
-            "jobs_skills"
-            ))
+    return load(jobs_skills_data_source, "jobs_skills")[1]
 
 
 def jobs() -> dict[int, str]:
-    return {i: j # type:ignore
-        for i, j in enumerate(
-                        jobs_skills_df().loc[:, "Métier"], # type:ignore
-                        )
-        }
+    return data_set().jobs
 
 
 def skills() -> dict[int, str]:
-    return {i: s
-          for i, s in enumerate(
-              jobs_skills_df().drop(columns=["Métier"])
-              .columns # type:ignore
-              )
-          }
+    return data_set().skills
 
 
 def skill_ids() -> list[int]:
-    return list(range(len(skills())))
+    return list(skills())
 
 
 def experiences() -> dict[int, tuple[str, str]]:
-    return {i: (exp, exp_type)
-            for i, (exp, exp_type) in enumerate(
-                experiences_skills_df().loc[:, ["Expérience", "type"]].values # type:ignore
-                )
-            }
+    return data_set().experiences
 
 
 def experiences_skills() -> pa.DataFrame:
-    skills_ = skills()
-    return (experiences_skills_df()
-            .loc[:, [skills_[s] for s in skill_ids()]]
-            .rename(
-               columns={x: i for i, x in skills_.items()}
-               )
-            )
+    return data_set().experiences_skills
 
 
 def jobs_skills() -> pa.DataFrame:
-    skills_ = skills()
-    return (jobs_skills_df()
-            .loc[:, [skills_[s] for s in skill_ids()]]
-            .rename(
-                columns={x: i for i, x in skills_.items()}
-                )
-            )
+    return data_set().jobs_skills
 
 def get_data():
     return jobs(), skills(), experiences(), experiences_skills(), jobs_skills()
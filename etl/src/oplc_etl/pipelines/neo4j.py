@@ -2,10 +2,12 @@ import os
 from pathlib import Path
 import numpy as np
 import pandas as pa
+import scipy.sparse as sp
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable
 from contextlib import contextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+from oplc_etl.columnar import read_columnar, write_columnar
 
 import logging
 
@@ -16,29 +18,74 @@ neo4jPass=os.getenv("NEO4J_PASS")
 default_cache_dir = Path("/tmp/diagoriente-oplc/data")
 
 
-def download_data_to_disk(dir: Path = default_cache_dir):
+# The data is cached on disk in the columnar format of oplc_etl.columnar, with
+# the jobs × skills map in its uint8 matrix, and exported as csv files.
+
+_TABLES = ("jobs", "skills", "sectors", "jobs_skills")
+
+
+def download_data_to_disk(dir: Path = default_cache_dir, csv: bool = True):
     result = get_data(cache_dir=None)
 
     dir.mkdir(parents=True, exist_ok=True)
 
-    result.jobs.to_csv(dir/"jobs.csv")
-    result.skills.to_csv(dir/"skills.csv")
-    result.sectors.to_csv(dir/"sectors.csv")
-    result.jobs_skills.to_csv(dir/"jobs_skills.csv")
+    for table in _TABLES:
+        df = getattr(result, table)
+        write_columnar(df, dir/f"{table}.npz",
+                       matrix_columns=(list(df.columns) if table == "jobs_skills"
+                                       else None))
+        if csv:
+            df.to_csv(dir/f"{table}.csv")
+
 
+def get_data(
+        cache_dir: Path | None = None,
+        sparse: bool = False,
+        columns: dict[str, list[str]] | None = None,
+        ):
+    """Jobs, skills, sectors and the jobs × skills map.
+
+    When `sparse` is True, the jobs × skills map is a data frame with pandas
+    sparse columns, which only stores the job-skill edges.
+
+    `columns` gives the columns to keep of the jobs, skills and sectors tables,
+    by table name. All the columns of the other tables are kept. Only these
+    columns are read from the columnar cache, the csv files are read whole.
+
+    The data is read from the columnar cache in `cache_dir` if any, or else
+    from the csv files in `cache_dir`, or from neo4j if `cache_dir` is None.
+    """
+    columns = columns or {}
 
-def get_data(cache_dir: Path | None = None):
     result = None
 
     if cache_dir is None:
         with driver() as d:
-            result = get_job_skill_data(d)
+            result = get_job_skill_data(d, sparse=sparse)
+        result = replace(result, **{table: getattr(result, table).loc[:, c]
+                                    for table, c in columns.items()})
+    elif all((cache_dir/f"{table}.npz").exists() for table in _TABLES):
+        jobs_skills = read_columnar(cache_dir/"jobs_skills.npz")
+        if sparse:
+            jobs_skills = jobs_skills.astype(
+                    pa.SparseDtype(jobs_skills.to_numpy().dtype, 0))
+
+        result = Result(
+                jobs=read_columnar(cache_dir/"jobs.npz", columns.get("jobs")),
+                skills=read_columnar(cache_dir/"skills.npz", columns.get("skills")),
+                sectors=read_columnar(cache_dir/"sectors.npz", columns.get("sectors")),
+                jobs_skills=jobs_skills,
+                )
     else:
+        jobs_skills = pa.read_csv(cache_dir/"jobs_skills.csv")
+        if sparse:
+            jobs_skills = jobs_skills.astype(pa.SparseDtype(int, 0))
+
         result = Result(
                 jobs=pa.read_csv(cache_dir/"jobs.csv"),
                 skills=pa.read_csv(cache_dir/"skills.csv"),
                 sectors=pa.read_csv(cache_dir/"sectors.csv"),
-                jobs_skills=pa.read_csv(cache_dir/"jobs_skills.csv"),
+                jobs_skills=jobs_skills,
                 )
 
     return result
@@ -62,7 +109,7 @@ class Result:
     jobs_skills: pa.DataFrame
 
 
-def get_job_skill_data(driver):
+def get_job_skill_data(driver, sparse: bool = False):
     jobs = {}
     skills = {}
     sectors = {}
@@ -132,15 +179,33 @@ def get_job_skill_data(driver):
     skills = pa.DataFrame(skills.values()).set_index("skill")
     sectors = pa.DataFrame(sectors.values()).set_index("sector")
 
-    jobs_skills = pa.DataFrame(
-            np.zeros((len(jobs), len(skills)), dtype=int),
-            columns=skills.index,
-            index=jobs.index,
-            )
-
-    for (j,s) in edges:
-        if j in jobs.index and s in skills.index:
-            jobs_skills.loc[j, s] = 1
+    # Build the jobs × skills map from the edge list. The edges are converted
+    # to matrix positions at once, edges to unknown jobs or skills are ignored.
+    edge_jobs = jobs.index.get_indexer([j for (j, _) in edges])
+    edge_skills = skills.index.get_indexer([s for (_, s) in edges])
+    valid = (edge_jobs >= 0) & (edge_skills >= 0)
+    edge_jobs, edge_skills = edge_jobs[valid], edge_skills[valid]
+
+    if sparse:
+        matrix = sp.coo_matrix(
+                (np.ones(len(edge_jobs), dtype=int), (edge_jobs, edge_skills)),
+                shape=(len(jobs), len(skills)),
+                ).tocsr()
+        # Duplicated edges are summed on conversion, the map is binary.
+        matrix.data[:] = 1
+        jobs_skills = pa.DataFrame.sparse.from_spmatrix(
+                matrix,
+                index=jobs.index,
+                columns=skills.index,
+                )
+    else:
+        matrix = np.zeros((len(jobs), len(skills)), dtype=int)
+        matrix[edge_jobs, edge_skills] = 1
+        jobs_skills = pa.DataFrame(
+                matrix,
+                columns=skills.index,
+                index=jobs.index,
+                )
 
     return Result(
             jobs=jobs,
@@ -0,0 +1,145 @@
+from bisect import bisect_left
+from collections import Counter
+from threading import Lock
+from types import MappingProxyType
+from typing import Callable, Generic, Iterator, Mapping, Optional, Tuple, TypeVar
+import unicodedata
+
+
+# Jobs, skills and experiences are looked up by id and by name, and searched by
+# name for autocompletion. A catalog holds the entries of one kind for a data
+# set, with the indexes built once, the name indexes on the first lookup by
+# name:
+# - entries by id, the catalog being itself a read-only mapping,
+# - ids by normalised name, ignoring case, accents and extra spaces,
+# - the sorted names and words of the names, for prefix search,
+# - ids by trigram of their name, for fuzzy search.
+
+T = TypeVar("T")
+
+
+def normalize_name(name: str) -> str:
+    """Name without case, accents and extra spaces.
+
+    >>> normalize_name("  Éducateur   Spécialisé ")
+    'educateur specialise'
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+def _trigrams(normalized: str) -> set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Catalog(Mapping[int, T], Generic[T]):
+    """Entries by id, with name indexes.
+
+    >>> catalog = mk_catalog({1: "Nettoyage de locaux", 2: "Plonge en restauration",
+    ...                       3: "Service en restauration"}, name=str)
+    >>> catalog[2]
+    'Plonge en restauration'
+    >>> catalog.id_by_name("plonge en RESTAURATION")
+    2
+    >>> catalog.search("restau")
+    [2, 3]
+    >>> catalog.search("netoyage")
+    [1]
+    """
+
+    def __init__(self, entries: Mapping[int, T], name: Callable[[T], str]):
+        self._entries: Mapping[int, T] = MappingProxyType(dict(entries))
+        self._name = name
+        self._indexed = False
+        self._lock = Lock()
+
+    def _index(self) -> None:
+        with self._lock:
+            if self._indexed:
+                return
+
+            normalized = {i: normalize_name(self._name(e))
+                          for i, e in self._entries.items()}
+
+            by_name: dict[str, int] = {}
+            for i, n in normalized.items():
+                by_name.setdefault(n, i)
+            self._by_name: Mapping[str, int] = MappingProxyType(by_name)
+
+            self._names: list[Tuple[str, int]] = sorted((n, i) for i, n in normalized.items())
+            self._words: list[Tuple[str, int]] = sorted(
+                    (w, i) for i, n in normalized.items() for w in set(n.split()))
+
+            trigrams: dict[str, list[int]] = {}
+            for i, n in normalized.items():
+                for t in _trigrams(n):
+                    trigrams.setdefault(t, []).append(i)
+            self._trigrams: Mapping[str, Tuple[int, ...]] = MappingProxyType(
+                    {t: tuple(ids) for t, ids in trigrams.items()})
+            self._indexed = True
+
+    def __getitem__(self, id: int) -> T:
+        return self._entries[id]
+
+    def __contains__(self, id: object) -> bool:
+        return id in self._entries
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def id_by_name(self, name: str) -> Optional[int]:
+        self._index()
+        return self._by_name.get(normalize_name(name))
+
+    def search(self, query: str, limit: int = 20) -> list[int]:
+        """Ids of the entries matching the query, best matches first.
+
+        Names starting with the query come first, then names with a word
+        starting with the query, then names sharing trigrams with the query.
+        """
+        q = normalize_name(query)
+        if q == "":
+            return []
+        self._index()
+
+        found: dict[int, None] = {}
+
+        for sorted_names in (self._names, self._words):
+            k = bisect_left(sorted_names, (q, -1))
+            while k < len(sorted_names) and len(found) < limit \
+                    and sorted_names[k][0].startswith(q):
+                found.setdefault(sorted_names[k][1])
+                k += 1
+
+        if len(found) < limit:
+            # Share of the trigrams of the query found in the name.
+            query_trigrams = _trigrams(q)
+            shared = Counter(i for t in query_trigrams
+                             for i in self._trigrams.get(t, ()))
+            scores = {
+                    i: c / len(query_trigrams)
+                    for i, c in shared.items()
+                    if i not in found
+                    }
+            for i in sorted(scores, key=lambda i: (-scores[i], i)):
+                if len(found) >= limit or scores[i] < SEARCH_MIN_SIMILARITY:
+                    break
+                found.setdefault(i)
+
+        return list(found)
+
+
+# Minimal trigram similarity of a fuzzy search match.
+SEARCH_MIN_SIMILARITY = 0.5
+
+
+def mk_catalog(
+        entries: Mapping[int, T],
+        name: Callable[[T], str] = lambda e: e.name, # type:ignore
+        ) -> Catalog[T]:
+    return Catalog(entries, name)
@@ -0,0 +1,226 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, Literal, get_args
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+import networkx as nx
+
+
+# Skill centrality is measured on the skill graph with the betweenness
+# centrality, counting endpoints, like nx.betweenness_centrality(g,
+# endpoints=True). The networkx implementation walks the graph one node at a
+# time in Python. Here Brandes' algorithm runs on the CSR adjacency matrix
+# instead: the breadth-first searches from a batch of sources advance together,
+# one level at a time, each level being a sparse matrix product, and the
+# dependencies are accumulated back the same way.
+#
+# The approximate mode only runs the searches from a random sample of sources
+# (pivots) and rescales the result, like the k parameter of networkx.
+
+CentralityMeasure = Callable[[nx.Graph], dict[int, float]]
+
+
+# Number of entries of the dense nodes × sources matrices used for one batch of
+# searches.
+_BATCH_SIZE = 1 << 22
+
+
+def adjacency_betweenness(
+        adjacency: sp.csr_array,
+        sources: Optional[int] = None,
+        seed: Optional[int] = None,
+        ) -> npt.NDArray[np.float64]:
+    """Normalized betweenness centrality, counting endpoints, of the nodes of
+    an unweighted undirected graph given by its adjacency matrix.
+
+    Self loops and edge weights are ignored. If sources is given, only that
+    many randomly chosen sources are used, at most all the nodes. Raises a
+    ValueError if sources is less than 1.
+
+    >>> path = sp.csr_array(np.array([[1, 1, 0], [1, 1, 1], [0, 1, 1]]))
+    >>> adjacency_betweenness(path)
+    array([0.66666667, 1.        , 0.66666667])
+    >>> adjacency_betweenness(path, sources=0)
+    Traceback (most recent call last):
+    ...
+    ValueError: The number of sources must be at least 1, got 0
+    """
+    if sources is not None and sources < 1:
+        raise ValueError(f"The number of sources must be at least 1, got {sources}")
+
+    n = adjacency.shape[0] # type:ignore
+    if n == 0:
+        return np.zeros(0)
+
+    a = sp.csr_array(adjacency, dtype=np.float64, copy=True)
+    a.setdiag(0)
+    a.eliminate_zeros()
+    a.data[:] = 1.0
+
+    sources = n if sources is None else min(sources, n)
+    if sources == n:
+        source_nodes = np.arange(n)
+    else:
+        rng = np.random.default_rng(seed)
+        source_nodes = np.sort(rng.choice(n, size=sources, replace=False))
+
+    betweenness = np.zeros(n)
+    batch = max(1, _BATCH_SIZE // n)
+    for start in range(0, len(source_nodes), batch):
+        betweenness += _accumulate(a, source_nodes[start:start + batch])
+
+    # Same rescaling as networkx with endpoints: divide by the number of
+    # ordered pairs of distinct nodes from the sampled sources.
+    if n < 2:
+        return betweenness
+    return betweenness / (len(source_nodes) * (n - 1))
+
+
+def _accumulate(
+        a: sp.csr_array,
+        sources: npt.NDArray[np.int64],
+        ) -> npt.NDArray[np.float64]:
+    n = a.shape[0] # type:ignore
+    columns = np.arange(len(sources))
+
+    # Distance and number of shortest paths from each source (columns) to each
+    # node (rows).
+    distance = np.full((n, len(sources)), -1, dtype=np.int64)
+    sigma = np.zeros((n, len(sources)))
+    distance[sources, columns] = 0
+    sigma[sources, columns] = 1.0
+
+    frontier = sigma.copy()
+    depth = 0
+    while True:
+        paths = a @ frontier
+        reached = (paths > 0) & (distance < 0)
+        if not reached.any():
+            break
+        depth += 1
+        distance[reached] = depth
+        sigma[reached] = paths[reached]
+        frontier = np.where(reached, paths, 0.0)
+
+    # Dependencies, from the deepest level up to the sources.
+    delta = np.zeros((n, len(sources)))
+    for d in range(depth, 0, -1):
+        coeff = np.where(distance == d, (1.0 + delta) / np.where(sigma > 0, sigma, 1.0), 0.0)
+        delta += np.where(distance == d - 1, sigma * (a @ coeff), 0.0)
+
+    # With endpoints, each source gets one count for each node it reaches and
+    # each reached node one more for being a target.
+    betweenness = np.where(distance > 0, delta + 1.0, 0.0).sum(axis=1)
+    np.add.at(betweenness, sources, (distance >= 0).sum(axis=0) - 1)
+    return betweenness
+
+
+def betweenness_centrality(
+        g: nx.Graph,
+        sources: Optional[int] = None,
+        seed: Optional[int] = None,
+        ) -> dict[int, float]:
+    """Betweenness centrality of the skill graph, counting endpoints.
+
+    >>> g = nx.Graph([(1, 2), (1, 3), (2, 4), (3, 4), (4, 5)])
+    >>> {s: round(c, 2) for s, c in betweenness_centrality(g).items()}
+    {1: 0.45, 2: 0.5, 3: 0.5, 4: 0.75, 5: 0.4}
+    """
+    nodes = list(g.nodes)
+    if len(nodes) == 0:
+        return {}
+    adjacency = nx.to_scipy_sparse_array(g, nodelist=nodes, weight=None, format="csr")
+    betweenness = adjacency_betweenness(adjacency, sources, seed) # type:ignore
+    return dict(zip(nodes, betweenness.tolist()))
+
+
+# Named centrality measures, so that a measure can be chosen by name, for
+# instance in an API request. They run on the adjacency matrix of the graph,
+# except the networkx one, and can still be called on a networkx graph.
+
+CentralityMeasureName = Literal[
+        "betweenness",
+        "approximate_betweenness",
+        "networkx_betweenness",
+        ]
+
+CENTRALITY_MEASURES: list[str] = list(get_args(CentralityMeasureName))
+
+# Default number of sources of the approximate betweenness.
+APPROXIMATE_SOURCES = 64
+
+
+@dataclass(frozen=True)
+class NamedCentralityMeasure:
+    """A centrality measure given by its name and options.
+
+    Measures with the same name and options are equal, so that a measure can
+    be part of a cache key whatever the request it comes from.
+    """
+    name: CentralityMeasureName
+    sources: Optional[int] = None
+    seed: Optional[int] = None
+
+    @property
+    def needs_graph(self) -> bool:
+        """Whether the measure runs on a networkx graph rather than on the
+        adjacency matrix."""
+        return self.name == "networkx_betweenness"
+
+    def of_adjacency(
+            self,
+            adjacency: sp.csr_array,
+            nodes: list[int],
+            ) -> npt.NDArray[np.float64]:
+        """Centrality of the nodes of the graph given by its adjacency matrix,
+        in the order of the rows.
+
+        >>> path = sp.csr_array(np.array([[1, 1, 0], [1, 1, 1], [0, 1, 1]]))
+        >>> centrality_measure("betweenness").of_adjacency(path, [1, 2, 3])
+        array([0.66666667, 1.        , 0.66666667])
+        """
+        if self.needs_graph:
+            g = nx.relabel_nodes(nx.from_scipy_sparse_array(adjacency),
+                                 dict(enumerate(nodes)))
+            centrality = self(g)
+            return np.array([centrality[n] for n in nodes], dtype=np.float64)
+        elif self.name == "approximate_betweenness":
+            return adjacency_betweenness(adjacency, sources=self.sources, seed=self.seed)
+        else:
+            return adjacency_betweenness(adjacency)
+
+    def __call__(self, g: nx.Graph) -> dict[int, float]:
+        if self.needs_graph:
+            return nx.betweenness_centrality(g, endpoints=True) # type:ignore
+        nodes = list(g.nodes)
+        if len(nodes) == 0:
+            return {}
+        adjacency = nx.to_scipy_sparse_array(g, nodelist=nodes, weight=None, format="csr")
+        return dict(zip(nodes, self.of_adjacency(adjacency, nodes).tolist())) # type:ignore
+
+
+def centrality_measure(
+        name: CentralityMeasureName,
+        sources: Optional[int] = None,
+        seed: Optional[int] = None,
+        ) -> CentralityMeasure:
+    """The centrality measure with the given name.
+
+    The options that the measure doesn't use are dropped, so that equal
+    measures compare equal. Raises a KeyError for an unknown name.
+
+    >>> centrality_measure("betweenness", seed=1) == centrality_measure("betweenness")
+    True
+    >>> centrality_measure("approximate_betweenness", seed=1)
+    NamedCentralityMeasure(name='approximate_betweenness', sources=64, seed=1)
+    """
+    if name == "approximate_betweenness":
+        return NamedCentralityMeasure(
+                name,
+                sources=APPROXIMATE_SOURCES if sources is None else sources,
+                seed=seed,
+                )
+    elif name in CENTRALITY_MEASURES:
+        return NamedCentralityMeasure(name)
+    else:
+        raise KeyError(f"Unknown centrality measure {name}")
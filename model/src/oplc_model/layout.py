@@ -0,0 +1,274 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, Hashable, Literal, Tuple, get_args
+from concurrent.futures import Executor, wait
+from math import floor, sqrt
+from time import monotonic
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+from scipy.sparse.csgraph import shortest_path
+import networkx as nx
+
+
+# The skill graph returned with a recommendation comes with a layout: the
+# position of each skill in the plane. Each connected component is laid out
+# separately and the components are placed on a grid so they don't overlap.
+#
+# Several layout algorithms are available, from the most to the least
+# expensive:
+# - kamada_kawai, the networkx implementation, which minimizes the stress with
+#   a generic scipy optimizer on the dense distance matrix,
+# - stress, stress majorization where each node is only attracted by its
+#   neighbours and a set of pivots, starting from a pivot MDS layout,
+# - spectral_spring, a spectral layout refined by a few force-directed steps,
+# - spectral, the spectral layout alone.
+#
+# Components can be laid out in parallel on a pool of workers. With a time
+# budget, a component whose layout would exceed the budget is laid out with the
+# fallback algorithm instead.
+
+Position = npt.NDArray[np.float64]
+
+LayoutAlgorithmName = Literal["kamada_kawai", "stress", "spectral_spring", "spectral"]
+
+LAYOUT_ALGORITHMS: list[str] = list(get_args(LayoutAlgorithmName))
+
+
+def kamada_kawai_layout(g: nx.Graph) -> npt.NDArray[np.float64]:
+    pos = nx.kamada_kawai_layout(g)
+    return np.array([pos[n] for n in g.nodes])
+
+
+def spectral_layout(g: nx.Graph) -> npt.NDArray[np.float64]:
+    pos = nx.spectral_layout(g)
+    return np.array([pos[n] for n in g.nodes])
+
+
+def spectral_spring_layout(
+        g: nx.Graph,
+        iterations: int = 10,
+        ) -> npt.NDArray[np.float64]:
+    pos = nx.spring_layout(
+            g,
+            pos=nx.spectral_layout(g),
+            iterations=iterations,
+            seed=0,
+            )
+    return np.array([pos[n] for n in g.nodes])
+
+
+def stress_layout(
+        g: nx.Graph,
+        pivots: int = 50,
+        iterations: int = 50,
+        tolerance: float = 1e-4,
+        ) -> npt.NDArray[np.float64]:
+    """Sparse stress majorization of a connected graph.
+
+    The graph distances are only computed from a set of pivots. Each node is
+    placed at the distance of its neighbours and of the pivots given by the
+    graph.
+
+    >>> pos = stress_layout(nx.path_graph(3))
+    >>> round(float(np.linalg.norm(pos[0] - pos[2]) / np.linalg.norm(pos[0] - pos[1])), 3)
+    2.0
+    """
+    n = len(g)
+    if n <= 2:
+        return spectral_layout(g)
+
+    adjacency = nx.to_scipy_sparse_array(g, weight=None, format="csr")
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+
+    # Pivots spread over the graph: each new pivot is the node farthest from
+    # the previous ones.
+    k = min(n, pivots)
+    pivot_nodes = np.zeros(k, dtype=np.int64)
+    distances = np.zeros((k, n))
+    nearest = np.full(n, np.inf)
+    for p in range(k):
+        if p > 0:
+            pivot_nodes[p] = np.argmax(nearest)
+        distances[p] = shortest_path(adjacency, unweighted=True,
+                                     indices=pivot_nodes[p])
+        nearest = np.minimum(nearest, distances[p])
+
+    x = _pivot_mds(distances)
+
+    # Terms of the stress: edges, at distance 1, and node-pivot pairs.
+    edges = sp.coo_array(adjacency)
+    rows, cols = edges.row, edges.col
+    with np.errstate(divide="ignore"):
+        pivot_weights = np.where(distances > 0, 1 / distances ** 2, 0.0)
+    total_weights = (np.bincount(rows, minlength=n)
+                     + pivot_weights.sum(axis=0))
+
+    def stress(x: npt.NDArray[np.float64]) -> float:
+        to_pivots = np.linalg.norm(x[None, :, :] - x[pivot_nodes][:, None, :], axis=2)
+        along_edges = np.linalg.norm(x[rows] - x[cols], axis=1)
+        return float((pivot_weights * (to_pivots - distances) ** 2).sum()
+                     + ((along_edges - 1) ** 2).sum())
+
+    previous = stress(x)
+    for _ in range(iterations):
+        target = np.zeros((n, 2))
+
+        diff = x[rows] - x[cols]
+        length = np.maximum(np.linalg.norm(diff, axis=1), 1e-9)
+        moves = x[cols] + diff / length[:, None]
+        np.add.at(target, rows, moves)
+
+        diff = x[None, :, :] - x[pivot_nodes][:, None, :]
+        length = np.maximum(np.linalg.norm(diff, axis=2), 1e-9)
+        moves = x[pivot_nodes][:, None, :] + diff * (distances / length)[:, :, None]
+        target += (pivot_weights[:, :, None] * moves).sum(axis=0)
+
+        x = target / np.maximum(total_weights, 1e-9)[:, None]
+
+        current = stress(x)
+        if previous - current < tolerance * previous:
+            break
+        previous = current
+
+    return x
+
+
+def _pivot_mds(distances: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    # Classical MDS restricted to the pivots (Brandes and Pich), used as the
+    # starting layout of the stress majorization.
+    squared = distances.T ** 2
+    centered = (squared
+                - squared.mean(axis=0, keepdims=True)
+                - squared.mean(axis=1, keepdims=True)
+                + squared.mean())
+    centered = -0.5 * centered
+    _, vectors = np.linalg.eigh(centered.T @ centered)
+    x = centered @ vectors[:, ::-1][:, :2]
+    if x.shape[1] < 2:
+        x = np.hstack([x, np.zeros((x.shape[0], 2 - x.shape[1]))])
+    return x
+
+
+_ALGORITHMS: dict[str, Callable[[nx.Graph], npt.NDArray[np.float64]]] = {
+        "kamada_kawai": kamada_kawai_layout,
+        "stress": stress_layout,
+        "spectral_spring": spectral_spring_layout,
+        "spectral": spectral_layout,
+        }
+
+# Rough running time in seconds of each algorithm for a component with n nodes,
+# used to decide whether an algorithm fits in the remaining budget.
+_COSTS: dict[str, Callable[[int], float]] = {
+        "kamada_kawai": lambda n: 2e-5 * n ** 2,
+        "stress": lambda n: 5e-3 + 4e-4 * n,
+        "spectral_spring": lambda n: 2e-3 + 1.5e-6 * n ** 2,
+        "spectral": lambda n: 1e-3 + 7e-7 * n ** 2,
+        }
+
+
+@dataclass(frozen=True)
+class LayoutEngine:
+    """Lays out a graph component by component.
+
+    With an executor, like a ThreadPoolExecutor or a ProcessPoolExecutor kept
+    for the lifetime of the application, components are laid out in parallel.
+
+    >>> engine = LayoutEngine(algorithm="stress", budget=1.0)
+    >>> layout = engine(nx.Graph([(1, 2), (2, 3), (4, 5)]))
+    >>> sorted(layout)
+    [1, 2, 3, 4, 5]
+    """
+    algorithm: LayoutAlgorithmName = "kamada_kawai"
+    fallback: LayoutAlgorithmName = "spectral"
+    # Time budget in seconds for the whole graph, unlimited if None.
+    budget: Optional[float] = None
+    executor: Optional[Executor] = None
+
+    def __call__(self, g: nx.Graph) -> dict[Hashable, Position]:
+        deadline = None if self.budget is None else monotonic() + self.budget
+
+        components = [
+                g.subgraph(c).copy() #type:ignore
+                for c in nx.connected_components(g)
+                ]
+
+        # Choose a number of columns and rows just big enough to fit all the
+        # components.
+        n_components = len(components)
+        n = floor(sqrt(n_components))
+        if n * n == n_components:
+            n_row = n
+            n_col = n
+        elif n * (n + 1) > n_components:
+            n_row = n
+            n_col = n + 1
+        else:
+            n_row = n + 1
+            n_col = n + 1
+
+        centers = [(x, y) for y in range(n_row) for x in range(n_col)]
+
+        if self.executor is None or n_components <= 1:
+            positions = [
+                    layout_component(c, self.algorithm, self.fallback, deadline)
+                    for c in components
+                    ]
+        else:
+            futures = [
+                    self.executor.submit(layout_component, c, self.algorithm,
+                                         self.fallback, deadline)
+                    for c in components
+                    ]
+            timeout = None if deadline is None else max(0.0, deadline - monotonic())
+            wait(futures, timeout=timeout)
+            # Components still waiting or running when the budget is spent get
+            # the fallback layout.
+            positions = [
+                    f.result() if f.done() else layout_component(c, self.fallback)
+                    for f, c in zip(futures, components)
+                    ]
+            for f in futures:
+                f.cancel()
+
+        merged: dict[Hashable, Position] = {}
+        for (x, y), c, pos in zip(centers, components, positions):
+            merged.update(_place(c, pos, center=(x, y), scale=0.5))
+        return merged
+
+
+def layout_component(
+        component: nx.Graph,
+        algorithm: LayoutAlgorithmName,
+        fallback: Optional[LayoutAlgorithmName] = None,
+        deadline: Optional[float] = None,
+        ) -> npt.NDArray[np.float64]:
+    """Positions of the nodes of a connected graph, in the order of
+    component.nodes.
+
+    The fallback algorithm is used if the algorithm is not expected to end
+    before the deadline, given as a time.monotonic() value.
+    """
+    n = len(component)
+    if n <= 2:
+        # Components with one or two nodes don't need a layout algorithm.
+        return np.array([[0.0, 0.0], [1.0, 0.0]])[:n]
+    if fallback is not None and deadline is not None \
+            and monotonic() + _COSTS[algorithm](n) > deadline:
+        algorithm = fallback
+    return _ALGORITHMS[algorithm](component)
+
+
+def _place(
+        g: nx.Graph,
+        pos: npt.NDArray[np.float64],
+        center: Tuple[float, float],
+        scale: float,
+        ) -> dict[Hashable, Position]:
+    # Same centering and scaling as the networkx layouts.
+    if len(pos) > 1:
+        pos = nx.rescale_layout(pos - pos.mean(axis=0), scale=scale)
+    else:
+        pos = np.zeros((len(pos), 2))
+    pos = pos + np.array(center)
+    return dict(zip(g.nodes, pos))
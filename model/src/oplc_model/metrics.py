@@ -0,0 +1,260 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from time import perf_counter
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+
+# The model functions record how long their stages take, the size of the skill
+# graphs and the cache hits and misses in process wide metrics. The metrics are
+# rendered in the Prometheus text format, by the API at /metrics, or by batch
+# jobs at the end of a run.
+#
+# Counters and histograms have optional labels. Each combination of label
+# values is a separate series, label values should come from a small set.
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    """A monotonic count.
+
+    >>> requests = Counter("requests_total", "Requests.", ["status"], registry=None)
+    >>> requests.inc(status="200")
+    >>> requests.inc(2, status="200")
+    >>> print(requests.render())
+    # HELP requests_total Requests.
+    # TYPE requests_total counter
+    requests_total{status="200"} 3.0
+    """
+
+    def __init__(
+            self,
+            name: str,
+            help: str,
+            labelnames: Iterable[str] = (),
+            registry: "Registry | None" = None,
+            ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._lock = Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_values(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = _label_values(self.labelnames, labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {float(value)}")
+        return "\n".join(lines)
+
+
+# Buckets of durations in seconds and of graph sizes.
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Counts of observations in cumulative buckets, with their sum.
+
+    >>> sizes = Histogram("size", "Sizes.", buckets=(10, 100), registry=None)
+    >>> for size in (5, 10, 50, 500):
+    ...     sizes.observe(size)
+    >>> print(sizes.render())
+    # HELP size Sizes.
+    # TYPE size histogram
+    size_bucket{le="10"} 2
+    size_bucket{le="100"} 3
+    size_bucket{le="+Inf"} 4
+    size_sum 565.0
+    size_count 4
+    """
+
+    def __init__(
+            self,
+            name: str,
+            help: str,
+            labelnames: Iterable[str] = (),
+            buckets: Tuple[float, ...] = DURATION_BUCKETS,
+            registry: "Registry | None" = None,
+            ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: the count of each bucket, not cumulative, the last
+        # one being +Inf, and the sum of the observations.
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+        self._lock = Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_values(self.labelnames, labels)
+        # Buckets are inclusive upper bounds.
+        k = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[k] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        key = _label_values(self.labelnames, labels)
+        with self._lock:
+            return sum(self._counts.get(key, []))
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    labels = _labels(self.labelnames + ("le",), key + (le,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {float(self._sums[key])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return "\n".join(lines)
+
+
+def _label_values(labelnames: Tuple[str, ...], labels: dict[str, str]) -> LabelValues:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[n]) for n in labelnames)
+
+
+def _labels(labelnames: Tuple[str, ...], values: LabelValues) -> str:
+    if len(labelnames) == 0:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(labelnames, escaped)) + "}"
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._lock = Lock()
+
+    def register(self, metric: Counter | Histogram) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """All the metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(m.render() + "\n" for m in metrics)
+
+
+# Content type of Registry.render
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+        "oplc_stage_seconds",
+        "Duration of the stages of a job recommendation.",
+        ["stage"],
+        registry=REGISTRY,
+        )
+
+SKILL_GRAPH_NODES = Histogram(
+        "oplc_skill_graph_nodes",
+        "Number of skills in the skill graphs.",
+        buckets=SIZE_BUCKETS,
+        registry=REGISTRY,
+        )
+
+SKILL_GRAPH_EDGES = Histogram(
+        "oplc_skill_graph_edges",
+        "Number of edges in the skill graphs.",
+        buckets=SIZE_BUCKETS,
+        registry=REGISTRY,
+        )
+
+CACHE_REQUESTS = Counter(
+        "oplc_cache_requests_total",
+        "Cache lookups by cache and result, hit or miss.",
+        ["cache", "result"],
+        registry=REGISTRY,
+        )
+
+
+# Besides the process wide metrics, the stages and attributes, like the graph
+# size, of a single request can be collected in a trace. The trace is held in
+# a context variable: it collects what is recorded in the context where it was
+# started and in the contexts copied from it, like threads started with
+# contextvars.copy_context().run.
+
+@dataclass
+class Trace:
+    stages: list[Tuple[str, float]] = field(default_factory=list)
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Collect the stages and attributes recorded in the block.
+
+    >>> with trace() as t:
+    ...     with stage("test"):
+    ...         annotate(size=3)
+    >>> [name for name, _ in t.stages], t.attributes
+    (['test'], {'size': 3})
+    """
+    t = Trace()
+    token = _current_trace.set(t)
+    try:
+        yield t
+    finally:
+        _current_trace.reset(token)
+
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes to the current trace, if any."""
+    t = _current_trace.get()
+    if t is not None:
+        t.attributes.update(attributes)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record the duration of the block as stage `name`, and add it to the
+    current trace if any.
+
+    Stages that raise an exception are not recorded.
+    """
+    start = perf_counter()
+    yield
+    duration = perf_counter() - start
+    STAGE_SECONDS.observe(duration, stage=name)
+    t = _current_trace.get()
+    if t is not None:
+        t.stages.append((name, duration))
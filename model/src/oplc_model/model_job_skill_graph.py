@@ -1,13 +1,22 @@
 from dataclasses import dataclass
-from typing import Iterable, Tuple, Optional, Callable, NewType
+from typing import Iterable, Tuple, Optional, Callable, NewType, Hashable, Mapping
+from hashlib import sha256
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from concurrent.futures import Executor
 import pandas as pa
 from scipy.spatial.distance import pdist, squareform
 import numpy as np
 import numpy.typing as npt
+import scipy.sparse as sp
 import networkx as nx
 from lenses import lens
-from math import floor, sqrt
 from datetime import datetime
+from oplc_model.sparse import SparseFrame, count_dtype, sparse_frame
+from oplc_model.layout import LayoutEngine
+from oplc_model.catalog import Catalog
+from oplc_model import centrality, metrics
 
 
 # The objective of this application is to make job recommendations based on an
@@ -55,11 +64,45 @@ class Job:
 def mk_jobs(jobs: dict[int, str]) -> dict[int, Job]:
     return {i: Job(id=i, name=n) for i, n in jobs.items()}
 
-def job_id_by_name(jobs: dict[int, Job], name: str) -> int | None:
-    for j in jobs.values():
-        if j.name == name:
-            return j.id
-    return None
+def job_id_by_name(jobs: Catalog[Job], name: str) -> int | None:
+    return jobs.id_by_name(name)
+
+
+# The data set is identified by a hash of its content, so that the responses
+# computed from it can be cached and validated by clients.
+
+def dataset_hash(
+        experiences_skills: "ExperiencesSkills",
+        jobs_skills: "JobsSkills",
+        jobs: Mapping[JobId, Job],
+        skills: Mapping[SkillId, Skill],
+        experiences: Mapping[ExperienceId, Experience],
+        ) -> str:
+    """Hexadecimal SHA-256 of the content of the data set.
+
+    >>> es = mk_experiences_skills(pa.DataFrame([[1, 0], [0, 1]]))
+    >>> js = mk_jobs_skills(pa.DataFrame([[1, 1]]))
+    >>> h = dataset_hash(es, js, mk_jobs({0: "a"}), mk_skills({0: "b", 1: "c"}), {})
+    >>> h == dataset_hash(es, js, mk_jobs({0: "a"}), mk_skills({0: "b", 1: "c"}), {})
+    True
+    >>> h == dataset_hash(es, js, mk_jobs({0: "A"}), mk_skills({0: "b", 1: "c"}), {})
+    False
+    """
+    h = sha256()
+
+    for m in (experiences_skills.df, jobs_skills.df):
+        h.update(repr((m.index.tolist(), m.columns.tolist())).encode())
+        if isinstance(m, SparseFrame):
+            csr = sp.csr_array(m.matrix)
+            for a in (csr.indptr, csr.indices, csr.data):
+                h.update(np.ascontiguousarray(a).tobytes())
+        else:
+            h.update(pa.util.hash_pandas_object(m).to_numpy().tobytes())
+
+    for entries in (jobs, skills, experiences):
+        h.update(repr(sorted((i, repr(e)) for i, e in entries.items())).encode())
+
+    return h.hexdigest()
 
 
 # Recommendations are constructed in two steps: first, infer the user's skill
@@ -71,58 +114,133 @@ def job_recommendation(
         jobs_skills: "JobsSkills",
         experiences: list[ExperienceId],
         return_graph: bool,
-        skill_centrality_measure: Callable[[nx.Graph], dict[SkillId, float]]
+        skill_centrality_measure: Callable[[nx.Graph], dict[SkillId, float]],
+        cache: Optional["SkillScoreCache"] = None,
+        dataset_version: Hashable = None,
+        layout_engine: Optional["GraphLayout"] = None,
         ) -> "JobRecommendation":
-    skill_scores, g = skills_from_experiences(experiences_skills, experiences,
-                                              skill_centrality_measure)
-    jobs = jobs_from_skills(jobs_skills, skill_scores)
+    """Job recommendation for the selected experiences.
 
-    if return_graph:
-        # Get connected subgraphs and lay them out separately so they don't
-        # overlap.
-        components: list[nx.Graph] = [
-                g.subgraph(c).copy() #type:ignore
-                for c in nx.connected_components(g)
-                ]
-
-        # Choose a number of columns and rows just big enough to fit all the
-        # components.
-        n_components = len(components)
-        n = floor(sqrt(n_components))
-        if n * n == n_components:
-            n_row = n
-            n_col = n
-        elif n * (n + 1) > n_components:
-            n_row = n
-            n_col = n + 1
-        else:
-            n_row = n + 1
-            n_col = n + 1
-
-        centers = [(x, y) for y in range(n_row) for x in range(n_col)]
-
-        layouts: list[dict[SkillId, npt.NDArray[np.float64]]] = [
-                nx.kamada_kawai_layout(
-                    c, # type:ignore
-                    center = (x, y),
-                    scale = 0.5,
-                    )
-                for (x, y), c in zip(centers, components)
-                ]
+    If a cache is given, the skill scores, the skill graph and its layout are
+    looked up there first, for the same experiences, centrality measure and
+    dataset version. A cached layout is reused whatever the layout engine.
+    The layout engine can be a LayoutEngine or a SkillMap.
+    """
+    key: Optional[SkillScoreKey] = None
+    cached: Optional[SkillScoreEntry] = None
+    if cache is not None:
+        key = skill_score_key(experiences, skill_centrality_measure,
+                              dataset_version)
+        cached = cache.get(key)
+
+    if cached is None:
+        entry = skills_from_experiences(experiences_skills, experiences,
+                                        skill_centrality_measure, return_graph)
+        if cache is not None and key is not None:
+            cache.put(key, entry)
+    else:
+        entry = cached
+
+    metrics.annotate(graph_nodes=len(entry.adjacency.skills),
+                     graph_edges=entry.adjacency.number_of_edges())
+    jobs = jobs_from_skills(jobs_skills, entry.skill_scores)
 
-        merged_layouts = {}
-        for l in layouts:
-            merged_layouts.update(l)
+    if return_graph:
+        if entry.layout is None:
+            if entry.graph is None:
+                with metrics.stage("skill_graph"):
+                    g = skill_graph_from_adjacency(entry.adjacency)
+                entry = lens.graph.set(g)(entry)
+            entry = lens.layout.set(skill_graph_layout(entry.graph, layout_engine))(entry)
+            if cache is not None and key is not None:
+                cache.put(key, entry)
 
         sg = SkillGraph(
-                graph=g,
-                layout=merged_layouts, # type: ignore
-                centrality=skill_scores.to_dict(), # type: ignore
+                graph=entry.graph,
+                layout=entry.layout, # type: ignore
+                centrality=entry.skill_scores.to_dict(), # type: ignore
                 )
         jobs = lens.skill_graph.set(sg)(jobs)
     return jobs
 
 
+def skill_graph_layout(
+        g: nx.Graph,
+        layout_engine: Optional["GraphLayout"] = None,
+        ) -> dict[SkillId, npt.NDArray[np.float64]]:
+    # Connected components are laid out separately so they don't overlap, with
+    # Kamada-Kawai unless another layout engine is given.
+    engine = LayoutEngine() if layout_engine is None else layout_engine
+    with metrics.stage("layout"):
+        return engine(g) # type:ignore
+
+
+# Laying out each skill graph from scratch costs time on every request and
+# puts the same skill at a different place for each user. Instead, the skill
+# graph of all the experiences can be laid out once per data set, and each
+# skill graph takes the positions of its skills on this global map. A few
+# relaxation steps then optionally move each skill towards its neighbours in
+# the request graph, while keeping it close to its place on the map.
+
+GraphLayout = Callable[[nx.Graph], dict[SkillId, npt.NDArray[np.float64]]]
+
+
+@dataclass(frozen=True)
+class SkillMap:
+    positions: dict[SkillId, npt.NDArray[np.float64]]
+    relaxation_steps: int = 0
+    # Weight of the neighbours against the position on the map at each
+    # relaxation step.
+    relaxation_strength: float = 0.5
+
+    def __call__(self, g: nx.Graph) -> dict[SkillId, npt.NDArray[np.float64]]:
+        """Positions of the skills of a skill graph.
+
+        >>> skill_map = SkillMap({1: np.array([0., 0.]), 2: np.array([2., 0.])},
+        ...                      relaxation_steps=1)
+        >>> skill_map(nx.Graph([(1, 2)]))
+        {1: array([0.66666667, 0.        ]), 2: array([1.33333333, 0.        ])}
+        """
+        skills = list(g.nodes)
+        anchors = np.array([self.positions.get(s, np.zeros(2)) for s in skills])
+        anchors = anchors.reshape(len(skills), 2)
+
+        positions = anchors
+        if self.relaxation_steps > 0 and len(skills) > 1:
+            adjacency = nx.to_scipy_sparse_array(g, nodelist=skills, weight=None,
+                                                 format="csr")
+            adjacency.setdiag(0)
+            adjacency.eliminate_zeros()
+            degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+            alpha = np.where(degrees > 0, self.relaxation_strength, 0.0)[:, None]
+            for _ in range(self.relaxation_steps):
+                neighbours = (adjacency @ positions) / np.maximum(degrees, 1)[:, None]
+                positions = (anchors + alpha * neighbours) / (1 + alpha)
+
+        return dict(zip(skills, positions))
+
+
+def mk_skill_map(
+        experiences_skills: "ExperiencesSkills",
+        layout_engine: Optional[GraphLayout] = None,
+        relaxation_steps: int = 0,
+        ) -> SkillMap:
+    """Lay out the skill graph of all the experiences.
+
+    >>> experiences_skills = mk_experiences_skills(pa.DataFrame(
+    ...     [[1, 0, 1],
+    ...      [1, 0, 0],
+    ...      [0, 1, 1]],
+    ...     columns=[10, 11, 12],
+    ...     ))
+    >>> sorted(mk_skill_map(experiences_skills).positions)
+    [10, 11, 12]
+    """
+    engine = LayoutEngine(algorithm="stress") if layout_engine is None else layout_engine
+    g = skill_graph(experiences_skills, list(experiences_skills.df.index))
+    return SkillMap(positions=engine(g), relaxation_steps=relaxation_steps)
+
+
 @dataclass(frozen=True)
 class JobRecommendation:
     scores: pa.Series
@@ -140,39 +258,156 @@ class SkillGraph:
     centrality: dict[SkillId, np.float64]
 
 
+# A small set of experience combinations, like onboarding presets, accounts for
+# most requests. The skill scores, the skill graph and its layout only depend
+# on the selected experiences, the centrality measure and the data set, so they
+# can be memoized. The experiences are sorted so that the order in which they
+# were selected doesn't matter. The centrality measure is compared by equality:
+# the measures of centrality.centrality_measure are equal for the same name and
+# options, other functions are only equal to themselves. The dataset version
+# must change, or the cache be cleared, when the experiences × skills map
+# changes.
+
+SkillScoreKey = Tuple[Tuple[ExperienceId, ...], Hashable, Hashable]
+
+
+def skill_score_key(
+        experiences: Iterable[ExperienceId],
+        skill_centrality_measure: Callable[[nx.Graph], dict[SkillId, float]],
+        dataset_version: Hashable,
+        ) -> SkillScoreKey:
+    return (tuple(sorted(experiences)), skill_centrality_measure, dataset_version)
+
+
+@dataclass(frozen=True)
+class SkillScoreEntry:
+    skill_scores: pa.Series
+    adjacency: "SkillAdjacency"
+    # The skill graph is only built when it is returned or when the centrality
+    # measure needs it.
+    graph: Optional[nx.Graph]
+    layout: Optional[dict[SkillId, npt.NDArray[np.float64]]]
+
+
+class SkillScoreCache:
+    """Thread safe LRU cache of skill scores with an optional time to live in
+    seconds.
+
+    >>> cache = SkillScoreCache(max_size=1)
+    >>> entry = SkillScoreEntry(pa.Series(dtype=float),
+    ...                         SkillAdjacency(sp.csr_array((0, 0)), []), None, None)
+    >>> cache.put(((1,), len, 0), entry)
+    >>> cache.get(((1,), len, 0)) is entry
+    True
+    >>> cache.put(((2,), len, 0), entry)
+    >>> cache.get(((1,), len, 0)) is None
+    True
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[SkillScoreKey, Tuple[float, SkillScoreEntry]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: SkillScoreKey) -> Optional[SkillScoreEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self.ttl is not None \
+                    and monotonic() - item[0] > self.ttl:
+                del self._entries[key]
+                item = None
+
+            if item is None:
+                self.misses += 1
+                metrics.CACHE_REQUESTS.inc(cache="skill_scores", result="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.CACHE_REQUESTS.inc(cache="skill_scores", result="hit")
+            return item[1]
+
+    def put(self, key: SkillScoreKey, entry: SkillScoreEntry) -> None:
+        with self._lock:
+            self._entries[key] = (monotonic(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 # Each step relies on a distinct map: one relating experiences to skills and
 # the other jobs to skills.  Each maps is encoded as a binary data frame where
 # the rows represent jobs (resp. experiences) and the columns represent skills.
+# Since the maps are mostly filled with zeros, they can instead be stored as
+# sparse CSR matrices with the same labels.
 
 @dataclass(frozen=True)
 class JobsSkills:
-    df: pa.DataFrame
+    df: pa.DataFrame | SparseFrame
 
 
-def mk_jobs_skills(df: pa.DataFrame) -> JobsSkills:
-    return JobsSkills(df=df)
+def mk_jobs_skills(df: pa.DataFrame, sparse: bool = False) -> JobsSkills:
+    return JobsSkills(df=sparse_frame(df) if sparse else df)
 
 
 @dataclass(frozen=True)
 class ExperiencesSkills:
-    df: pa.DataFrame
+    df: pa.DataFrame | SparseFrame
 
 
-def mk_experiences_skills(df: pa.DataFrame) -> ExperiencesSkills:
-    return ExperiencesSkills(df=df)
+def mk_experiences_skills(
+        df: pa.DataFrame,
+        sparse: bool = False,
+        ) -> ExperiencesSkills:
+    return ExperiencesSkills(df=sparse_frame(df) if sparse else df)
 
 
 # At the first step, we compute a user's skill centrality by constructing a
 # skill graph and measuring each skills betweenness centrality in the graph.
+# The named measures of centrality.centrality_measure run on the adjacency
+# matrix of the graph, so the networkx graph is only built when it is returned
+# or when the centrality measure needs it.
 
 def skills_from_experiences(
         experiences_skills: ExperiencesSkills,
         experiences: list[ExperienceId],
-        skill_centrality_measure: Callable[[nx.Graph], dict[SkillId, float]]
-        ) -> Tuple[pa.Series, nx.Graph]:
-    g: nx.Graph = skill_graph(experiences_skills, experiences)
-    scores: pa.Series = skill_scores(g, skill_centrality_measure)
-    return scores, g
+        skill_centrality_measure: Callable[[nx.Graph], dict[SkillId, float]],
+        return_graph: bool = True,
+        ) -> "SkillScoreEntry":
+    needs_graph = not _adjacency_measure(skill_centrality_measure)
+    with metrics.stage("skill_graph"):
+        adjacency = skill_adjacency(experiences_skills, experiences)
+        g: Optional[nx.Graph] = None
+        if return_graph or needs_graph:
+            g = skill_graph_from_adjacency(adjacency)
+    metrics.SKILL_GRAPH_NODES.observe(len(adjacency.skills))
+    metrics.SKILL_GRAPH_EDGES.observe(adjacency.number_of_edges())
+    with metrics.stage("centrality"):
+        if needs_graph:
+            scores: pa.Series = skill_scores(g, skill_centrality_measure) # type:ignore
+        else:
+            scores = adjacency_skill_scores(adjacency, skill_centrality_measure) # type:ignore
+    return SkillScoreEntry(skill_scores=scores, adjacency=adjacency, graph=g,
+                           layout=None)
+
+
+def _adjacency_measure(
+        skill_centrality_measure: Callable[[nx.Graph], dict[SkillId, float]],
+        ) -> bool:
+    return isinstance(skill_centrality_measure, centrality.NamedCentralityMeasure) \
+            and not skill_centrality_measure.needs_graph
 
 def skill_graph(
         experiences_skills: ExperiencesSkills,
@@ -186,36 +421,87 @@ def skill_graph(
     corresponding experiences, experiences[i] and experiences[j] share a common
     experience.
 
-    >>> experiences_skills = ExperiencesSkills(df=pa.DataFrame(
+    >>> experiences_skills = mk_experiences_skills(pa.DataFrame(
     ...     [[1, 0, 1],
     ...      [1, 0, 0],
     ...      [1, 1, 1]],
-    ...     columns=["skill_1", "skill_2", "skill_3"],
-    ...     index=[("exp_1", "pro"), ("exp_2", "pro"), ("exp_3", "perso")],
+    ...     columns=[10, 11, 12],
     ...     ))
-    >>> selected_experiences = [
-    ...     Experience(name="exp_1", exp_type="pro"),
-    ...     Experience(name="exp_2", exp_type="pro"),
-    ...     ]
-    >>> g = skill_graph(experiences_skills, selected_experiences)
+    >>> g = skill_graph(experiences_skills, [0, 1])
     >>> for edge in nx.generate_edgelist(g):
     ...     print(edge)
-    Skill(name='skill_1') Skill(name='skill_1') {'weight': 2}
-    Skill(name='skill_1') Skill(name='skill_3') {'weight': 1}
-    Skill(name='skill_3') Skill(name='skill_3') {'weight': 1}
+    10 10 {'weight': 2}
+    10 12 {'weight': 1}
+    12 12 {'weight': 1}
     """
-    index = [x for x in experiences]
-    selected_experiences: npt.NDArray[np.int32] = experiences_skills.df.loc[index, :].values
-    positive_skills: pa.Series = selected_experiences.sum(axis=0) > 0
-    selected_skills: list[SkillId] = [
-            s for s in experiences_skills.df.columns[positive_skills]
-            ]
-    selected_experiences_skills = selected_experiences[:, positive_skills]
-    adjacency_matrix = np.matmul(
-            selected_experiences_skills.transpose(),
-            selected_experiences_skills)
-    g = nx.Graph(adjacency_matrix)
-    g = nx.relabel_nodes(g, {i: x for i, x in enumerate(selected_skills)})
+    return skill_graph_from_adjacency(
+            skill_adjacency(experiences_skills, experiences))
+
+
+# The skill graph is built from a sparse adjacency matrix. Centrality measures
+# that don't need networkx can work on the adjacency matrix directly.
+
+@dataclass(frozen=True)
+class SkillAdjacency:
+    # Symmetric matrix of the number of selected experiences shared by each
+    # pair of skills. Rows and columns correspond to skills.
+    matrix: sp.csr_array
+    skills: list[SkillId]
+
+    def number_of_edges(self) -> int:
+        # Same count as nx.Graph.number_of_edges, self loops included.
+        return sp.triu(self.matrix).nnz
+
+
+def skill_adjacency(
+        experiences_skills: ExperiencesSkills,
+        experiences: list[ExperienceId],
+        ) -> SkillAdjacency:
+    """The adjacency matrix of the skill graph.
+
+    Only the skills of the selected experiences are kept.
+
+    >>> experiences_skills = mk_experiences_skills(pa.DataFrame(
+    ...     [[1, 0, 1],
+    ...      [1, 0, 0],
+    ...      [1, 1, 1]],
+    ...     columns=[10, 11, 12],
+    ...     ), sparse=True)
+    >>> adjacency = skill_adjacency(experiences_skills, [0, 1])
+    >>> adjacency.skills
+    [10, 12]
+    >>> adjacency.matrix.toarray()
+    array([[2, 1],
+           [1, 1]])
+    """
+    if isinstance(experiences_skills.df, SparseFrame):
+        selected = experiences_skills.df.rows(experiences).matrix
+    else:
+        positions = experiences_skills.df.index.get_indexer(experiences)
+        if (positions < 0).any():
+            raise KeyError(f"{[e for e, p in zip(experiences, positions) if p < 0]} not in index")
+        selected = sp.csr_array(experiences_skills.df.to_numpy()[positions, :])
+
+    positive_skills = np.flatnonzero(np.asarray(selected.sum(axis=0)).ravel() > 0)
+    selected = selected[:, positive_skills].astype(count_dtype(selected.dtype))
+
+    return SkillAdjacency(
+            matrix=sp.csr_array(selected.T @ selected),
+            skills=experiences_skills.df.columns[positive_skills].tolist(),
+            )
+
+
+def skill_graph_from_adjacency(adjacency: SkillAdjacency) -> nx.Graph:
+    # Nodes are labelled with skill ids from the start and edges are added in a
+    # single pass over the non-zero entries of the upper triangle.
+    upper = sp.triu(adjacency.matrix, format="coo")
+    skills = adjacency.skills
+    g = nx.Graph()
+    g.add_nodes_from(skills)
+    g.add_weighted_edges_from(
+            (skills[i], skills[j], w)
+            for i, j, w in zip(upper.row.tolist(), upper.col.tolist(), upper.data.tolist())
+            )
     return g
 
 
@@ -254,6 +540,27 @@ def skill_scores(
     return pa.Series({s: c  for s, c in centrality.items()})
 
 
+def adjacency_skill_scores(
+        adjacency: SkillAdjacency,
+        centrality_measure: centrality.NamedCentralityMeasure,
+        ) -> pa.Series:
+    """Centrality of each skill by a named measure, computed on the adjacency
+    matrix of the skill graph.
+
+    >>> adjacency = SkillAdjacency(
+    ...     sp.csr_array(np.array([[1, 1, 0], [1, 1, 1], [0, 1, 1]])), [1, 2, 3])
+    >>> adjacency_skill_scores(adjacency, centrality.centrality_measure("betweenness"))
+    1    0.666667
+    2    1.000000
+    3    0.666667
+    dtype: float64
+    """
+    return pa.Series(
+            centrality_measure.of_adjacency(adjacency.matrix, adjacency.skills),
+            index=adjacency.skills,
+            )
+
+
 # At the second step, we compute similarly the jobs scores by multiplying each
 # column by the corresponding skill_score and taking the sum over the columns.
 # The jobs with a score greater than 0 constitute the list of suggested jobs,
@@ -263,10 +570,105 @@ def jobs_from_skills(
         jobs_skills: JobsSkills,
         skill_scores: pa.Series,
         ) -> "JobRecommendation":
-    job_scores: pa.Series = ((jobs_skills.df * skill_scores)
-                              .sum(axis=1)
-                              .sort_values(ascending=False))
+    with metrics.stage("jobs_from_skills"):
+        return _jobs_from_skills(jobs_skills, skill_scores)
+
+
+def _jobs_from_skills(
+        jobs_skills: JobsSkills,
+        skill_scores: pa.Series,
+        ) -> "JobRecommendation":
+    if isinstance(jobs_skills.df, SparseFrame):
+        job_scores = pa.Series(
+                jobs_skills.df.matrix
+                @ skill_scores.reindex(jobs_skills.df.columns, fill_value=0).to_numpy(dtype=float),
+                index=jobs_skills.df.index,
+                ).sort_values(ascending=False)
+    else:
+        job_scores: pa.Series = ((jobs_skills.df * skill_scores)
+                                  .sum(axis=1)
+                                  .sort_values(ascending=False))
     job_scores = job_scores.loc[job_scores > 0]
     return JobRecommendation(scores=job_scores, skill_graph=None)
 
 
+def jobs_from_skills_batch(
+        jobs_skills: JobsSkills,
+        skill_scores: list[pa.Series],
+        ) -> list["JobRecommendation"]:
+    """Job recommendations for several skill scores, with a single matrix
+    product.
+
+    >>> jobs_skills = mk_jobs_skills(pa.DataFrame(
+    ...     [[1, 0, 1],
+    ...      [0, 1, 0]],
+    ...     columns=[10, 11, 12],
+    ...     ))
+    >>> [r.scores.to_dict() for r in jobs_from_skills_batch(
+    ...     jobs_skills, [pa.Series({10: 0.5, 12: 0.25}), pa.Series({11: 1.0})])]
+    [{0: 0.75}, {1: 1.0}]
+    """
+    if len(skill_scores) == 0:
+        return []
+
+    with metrics.stage("jobs_from_skills_batch"):
+        return _jobs_from_skills_batch(jobs_skills, skill_scores)
+
+
+def _jobs_from_skills_batch(
+        jobs_skills: JobsSkills,
+        skill_scores: list[pa.Series],
+        ) -> list["JobRecommendation"]:
+    scores = np.column_stack([
+        s.reindex(jobs_skills.df.columns, fill_value=0).to_numpy(dtype=float)
+        for s in skill_scores
+        ])
+    if isinstance(jobs_skills.df, SparseFrame):
+        job_scores = jobs_skills.df.matrix @ scores
+    else:
+        job_scores = jobs_skills.df.to_numpy(dtype=float) @ scores
+
+    recommendations = []
+    for k in range(len(skill_scores)):
+        js = pa.Series(job_scores[:, k], index=jobs_skills.df.index)
+        js = js.loc[js > 0].sort_values(ascending=False)
+        recommendations.append(JobRecommendation(scores=js, skill_graph=None))
+    return recommendations
+
+
+def job_recommendation_batch(
+        experiences_skills: ExperiencesSkills,
+        jobs_skills: JobsSkills,
+        experience_sets: list[list[ExperienceId]],
+        skill_centrality_measure: Callable[[nx.Graph], dict[SkillId, float]],
+        cache: Optional[SkillScoreCache] = None,
+        dataset_version: Hashable = None,
+        executor: Optional[Executor] = None,
+        ) -> list["JobRecommendation"]:
+    """Job recommendations, without skill graphs, for several sets of
+    experiences.
+
+    The skill scores of the experience sets are computed on the executor if
+    given, and the job scores with a single matrix product.
+    """
+    def scores(experiences: list[ExperienceId]) -> pa.Series:
+        if cache is None:
+            return skills_from_experiences(experiences_skills, experiences,
+                                           skill_centrality_measure,
+                                           return_graph=False).skill_scores
+        key = skill_score_key(experiences, skill_centrality_measure,
+                              dataset_version)
+        entry = cache.get(key)
+        if entry is None:
+            entry = skills_from_experiences(experiences_skills, experiences,
+                                            skill_centrality_measure,
+                                            return_graph=False)
+            cache.put(key, entry)
+        return entry.skill_scores
+
+    if executor is None:
+        skill_scores = [scores(e) for e in experience_sets]
+    else:
+        skill_scores = list(executor.map(scores, experience_sets))
+
+    return jobs_from_skills_batch(jobs_skills, skill_scores)
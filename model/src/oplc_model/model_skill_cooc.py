@@ -1,13 +1,15 @@
 from dataclasses import dataclass
-from typing import Iterable, Tuple, Optional, Callable, NewType
+from typing import Any, Iterable, Tuple, Optional, Callable, NewType
 import pandas as pa
 from scipy.spatial.distance import pdist, squareform
 import numpy as np
 import numpy.typing as npt
+import scipy.sparse as sp
 import networkx as nx
 from lenses import lens
 from math import floor, sqrt
 from datetime import datetime
+from oplc_model.sparse import SparseFrame, count_dtype, sparse_frame
 
 
 Skills = NewType("Skills", pa.DataFrame)
@@ -36,16 +38,43 @@ def mk_sectors(sectors: pa.DataFrame) -> Sectors:
 
 JobsSkills = NewType("JobsSkills", pa.DataFrame)
 
+# The jobs × skills matrix can also be stored as a sparse CSR matrix, which the
+# functions below use without converting it to a dense matrix.
 
-def mk_jobs_skills(df: pa.DataFrame) -> JobsSkills:
-    return JobsSkills(df)
+SparseJobsSkills = NewType("SparseJobsSkills", SparseFrame)
 
 
-SkillCooccurrence = NewType("SkillCooccurrence", pa.DataFrame)
+def mk_jobs_skills(
+        df: pa.DataFrame,
+        sparse: bool = False,
+        ) -> JobsSkills | SparseJobsSkills:
+    if sparse:
+        return SparseJobsSkills(sparse_frame(df))
+    else:
+        return JobsSkills(df)
 
 
-def skill_cooccurrence(jobs_skills: JobsSkills) -> "SkillCooccurrence":
-    skills_jobs = jobs_skills.transpose()
+SkillCooccurrence = NewType("SkillCooccurrence", pa.DataFrame)
+SparseSkillCooccurrence = NewType("SparseSkillCooccurrence", SparseFrame)
+
+
+def skill_cooccurrence(
+        jobs_skills: JobsSkills | SparseJobsSkills,
+        ) -> SkillCooccurrence | SparseSkillCooccurrence:
+    if isinstance(jobs_skills, SparseFrame):
+        skills_jobs = jobs_skills.matrix.T.astype(count_dtype(jobs_skills.matrix.dtype))
+        return SparseSkillCooccurrence(SparseFrame(
+                matrix=sp.csr_array(skills_jobs @ skills_jobs.T),
+                index=jobs_skills.columns,
+                columns=jobs_skills.columns,
+                ))
+
+    jobs_matrix = jobs_skills.to_numpy()
+    skills_jobs = pa.DataFrame(
+            jobs_matrix.astype(count_dtype(jobs_matrix.dtype)).T,
+            index=jobs_skills.columns,
+            columns=jobs_skills.index,
+            )
     # Remove skills that are not associated to any job
     # skills_jobs = skills_jobs.loc[skills_jobs.sum(axis=1) > 0, :]
 
@@ -77,62 +106,117 @@ class Model:
     level: int
 
 
-def model(
+def experience_weights(
         indiv_exp: IndividualExperiences,
-        jobs: Jobs,
-        jobs_skills: JobsSkills,
-        ) -> Model:
+        today: Optional[datetime] = None,
+        ) -> ExperienceWeights:
+    """Duration, recency and weight of each experience.
+
+    Each experience is split into the calendar years it spans. For each year,
+    the proportion of the year worked and the recency of the last day worked
+    (in years, relative to `today`) are computed, and the experience weight is
+    the sum over the years of proportion / (recency + 1). All the experiences
+    are processed at once with numpy datetime64 arithmetic.
+
+    `today` defaults to the current date. Pass it explicitly to get
+    reproducible results.
+
+    >>> indiv_exp = mk_individual_experiences(
+    ...     job_id=[1, 2],
+    ...     begin=["2020-07-01", "2021-01-01"],
+    ...     end=["2021-06-30", "2021-12-31"],
+    ...     )
+    >>> (experience_weights(indiv_exp, today=datetime(2022, 1, 1))
+    ...  .loc[:, ["duration", "recency", "weight"]]
+    ...  .round(3))
+       duration  recency  weight
+    0     0.999    0.507   0.580
+    1     1.000    0.003   0.997
+    """
+
+    if today is None:
+        today = datetime.today()
+
+    today_day = np.datetime64(today.date() if isinstance(today, datetime) else today, "D")
+    begin = pa.to_datetime(indiv_exp.loc[:, "begin"]).to_numpy().astype("datetime64[D]")
+    end = pa.to_datetime(indiv_exp.loc[:, "end"]).to_numpy().astype("datetime64[D]")
+
+    # Expand each experience into one row per calendar year it spans.
+    first_year = begin.astype("datetime64[Y]")
+    last_year = end.astype("datetime64[Y]")
+    n_years = (last_year - first_year).astype(int) + 1
+    experience = np.repeat(np.arange(len(begin)), n_years)
+    year_offset = np.arange(len(experience)) - np.repeat(np.cumsum(n_years) - n_years, n_years)
+    year = first_year[experience] + year_offset
+
+    year_first_day = year.astype("datetime64[D]")
+    next_year_first_day = (year + 1).astype("datetime64[D]")
+    days_per_year = (next_year_first_day - year_first_day).astype(float)
+
+    start_day = np.maximum(begin[experience], year_first_day)
+    end_day = np.minimum(end[experience], next_year_first_day - 1)
+
+    # Proportion of year worked for each year
+    year_proportion = ((end_day - start_day).astype(float) + 1) / days_per_year
+    # Experience recency per year
+    year_recency = (today_day - end_day).astype(float) / days_per_year
+
+    year_weight = year_proportion / (year_recency + 1)
+
+    n_exp = len(begin)
+    last_year_row = np.cumsum(n_years) - 1
 
     exp_weight = pa.DataFrame({
         "job_id": indiv_exp.loc[:, "job_id"],
         "begin": indiv_exp.loc[:, "begin"],
         "end": indiv_exp.loc[:, "end"],
-        "duration": np.empty(len(indiv_exp), dtype=float),
-        "recency": np.empty(len(indiv_exp), dtype=float),
-        "weight": np.empty(len(indiv_exp), dtype=float),
+        "duration": np.bincount(experience, weights=year_proportion, minlength=n_exp),
+        "recency": year_recency[last_year_row],
+        "weight": np.bincount(experience, weights=year_weight, minlength=n_exp),
         })
 
-    today = datetime.today()
-
-    for i in exp_weight.index:
-        begin = pa.to_datetime(exp_weight.loc[i, "begin"])
-        end = pa.to_datetime(exp_weight.loc[i, "end"])
-        years = list(range(begin.year, end.year + 1))
-        start_day_per_year = (
-                [begin]
-                + [datetime(year=y, month=1, day=1) for y in years[1:]]
-                )
-        end_day_per_year = (
-                [datetime(year=y, month=12, day=31) for y in years[:-1]]
-                + [end]
-                )
-        days_per_year = [(datetime(year=y+1, month=1, day=1) - datetime(year=y, month=1, day=1)).days 
-                          for y in years]
-        # Proportion of year worked for each year
-        year_proportion = [((e - s).days + 1) / d
-                           for s,e,d
-                           in zip(start_day_per_year, end_day_per_year, days_per_year)]
-        # Experience recency per year
-        year_recency = [(today - e).days / d for d, e in zip(days_per_year, end_day_per_year)]
+    return ExperienceWeights(exp_weight)
 
-        year_weight = [p / (r + 1) for p, r in zip(year_proportion, year_recency)]
 
-        experience_weight = sum(year_weight)
+def model(
+        indiv_exp: IndividualExperiences,
+        jobs: Jobs,
+        jobs_skills: JobsSkills | SparseJobsSkills,
+        today: Optional[datetime] = None,
+        job_index: Optional["JobIndex"] = None,
+        ) -> Model:
+    """The individual's skills, main job, main sector and level.
 
-        exp_weight.loc[i, "duration"] = sum(year_proportion)
-        exp_weight.loc[i, "recency"] = year_recency[-1]
-        exp_weight.loc[i, "weight"] = experience_weight
+    With `job_index`, the individual's skills are computed from its jobs ×
+    skills array instead of `jobs_skills`.
+    """
 
+    exp_weight = experience_weights(indiv_exp, today)
 
     # Multiply each experience skill (row) vector by the corresponding
     # experience weight and sum the results
-    indiv_skills = pa.DataFrame({
-        "weight": (jobs_skills.loc[exp_weight.job_id, :]
-                  .set_index(exp_weight.index)
-                  .mul(exp_weight.weight, axis="index")
-                  .sum()
-                  ),
-        })
+    if job_index is not None:
+        indiv_skills = pa.DataFrame({
+            "weight": (
+                exp_weight.weight.to_numpy()
+                @ job_index.jobs_skills[job_index.positions(exp_weight.job_id), :]
+                ),
+            }, index=job_index.skill_ids)
+    elif isinstance(jobs_skills, SparseFrame):
+        indiv_skills = pa.DataFrame({
+            "weight": (
+                exp_weight.weight.to_numpy()
+                @ jobs_skills.matrix[jobs_skills.positions(exp_weight.job_id), :]
+                ),
+            }, index=jobs_skills.columns)
+    else:
+        indiv_skills = pa.DataFrame({
+            "weight": (jobs_skills.loc[exp_weight.job_id, :]
+                      .set_index(exp_weight.index)
+                      .mul(exp_weight.weight, axis="index")
+                      .sum()
+                      ),
+            })
 
     indiv_main_job = exp_weight.loc[lambda x: x.weight.idxmax(), "job_id"]
     indiv_main_sector = jobs.loc[indiv_main_job, "sector"]
@@ -149,77 +233,601 @@ def model(
 
 
 
+# Job vectors don't depend on the individual. Their norms and the integer coded
+# job levels and sectors are computed once in a JobIndex that can be reused by
+# all the functions below. The jobs × skills matrix is kept as given, with its
+# compact integer type, rather than copied.
+
+@dataclass(frozen=True)
+class JobIndex:
+    job_ids: pa.Index
+    skill_ids: pa.Index
+    # Dense array, or CSR matrix when built from SparseJobsSkills
+    jobs_skills: npt.NDArray[np.number] | sp.csr_array
+    norms: npt.NDArray[np.float64]
+    level: npt.NDArray[np.int64]
+    sector: npt.NDArray[np.int64]
+    sectors: pa.Index
+
+    def skill_weights(self, skills: IndivSkills) -> npt.NDArray[np.float64]:
+        """The individual's skill weights aligned on the index skills."""
+        return (skills.weight
+                .reindex(self.skill_ids, fill_value=0)
+                .to_numpy(dtype=float))
+
+    def sector_code(self, sector: int) -> int:
+        """The integer code of a sector, -1 if no job belongs to it."""
+        return int(self.sectors.get_indexer([sector])[0])
+
+    def positions(self, job_ids: Iterable[int]) -> npt.NDArray[np.int64]:
+        """Row positions of the given jobs.
+
+        Raises a KeyError if a job is missing, like DataFrame.loc.
+        """
+        job_ids = list(job_ids)
+        positions = self.job_ids.get_indexer(job_ids)
+        if (positions < 0).any():
+            missing = [j for j, p in zip(job_ids, positions) if p < 0]
+            raise KeyError(f"{missing} not in index")
+        return positions
+
+
+def mk_job_index(
+        jobs: Jobs,
+        jobs_skills: JobsSkills | SparseJobsSkills,
+        ) -> JobIndex:
+
+    if isinstance(jobs_skills, SparseFrame):
+        jobs_matrix = sp.csr_array(jobs_skills.matrix)
+        squares = jobs_matrix.astype(float)
+        squares.data **= 2
+        norms = np.sqrt(np.asarray(squares.sum(axis=1))).ravel()
+    else:
+        jobs_matrix = np.ascontiguousarray(jobs_skills.to_numpy())
+        norms = np.sqrt(np.square(jobs_matrix, dtype=float).sum(axis=1))
+
+    sector, sectors = pa.factorize(jobs.loc[jobs_skills.index, "sector"])
+
+    return JobIndex(
+            job_ids=jobs_skills.index,
+            skill_ids=jobs_skills.columns,
+            jobs_skills=jobs_matrix,
+            norms=norms,
+            level=jobs.loc[jobs_skills.index, "level"].to_numpy(),
+            sector=sector,
+            sectors=pa.Index(sectors),
+            )
+
+
+def _job_access(
+        job_index: JobIndex,
+        skill_weights: npt.NDArray[np.float64],
+        ) -> npt.NDArray[np.float64]:
+    # Cosine similarity between each job and the individual skill vectors. Jobs
+    # or individuals without any skill get an accessibility of 0.
+    norm_indiv = np.sqrt((skill_weights ** 2).sum(axis=-1, keepdims=True))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        job_access = ((job_index.jobs_skills @ skill_weights.T).T
+                      / (job_index.norms * norm_indiv))
+    return np.nan_to_num(job_access, nan=0.0)
+
+
+def _level_diff_weights(
+        job_index: JobIndex,
+        level: npt.NDArray[np.int64],
+        ) -> npt.NDArray[np.float64]:
+    return np.minimum(
+            1,
+            1 - (job_index.level - np.asarray(level)[..., np.newaxis]) / 8,
+            )
+
+
+@dataclass
+class _RankedJobs:
+    job_access: npt.NDArray[np.float64]
+    rank_key: npt.NDArray[np.float64]
+    level_diff_weights: Optional[npt.NDArray[np.float64]]
+
+
+def _rank_jobs(
+        job_index: JobIndex,
+        skill_weights: npt.NDArray[np.float64],
+        level: npt.NDArray[np.int64],
+        main_sector: Iterable[int],
+        practiced_jobs: Iterable[Iterable[int]],
+        same_sector_first: bool,
+        hide_practiced_jobs: bool,
+        weigh_by_level_diff: bool,
+        show_level_min: int,
+        show_level_max: int,
+        ) -> _RankedJobs:
+    # Accessibility of each job for each individual (rows of skill_weights)
+    # and the key the jobs are ranked by. Hidden jobs have a key of -inf.
+
+    job_access = _job_access(job_index, skill_weights)
+
+    # Jobs are sorted by accessibility before being weighted by level
+    # difference. They are only sorted again by weighted accessibility when
+    # same sector jobs come first.
+    rank_key = job_access
+    lvl_diff_weight = None
+
+    if weigh_by_level_diff:
+        lvl_diff_weight = _level_diff_weights(job_index, level)
+        job_access = job_access * lvl_diff_weight
+
+    if same_sector_first:
+        main_sector_code = np.array([job_index.sector_code(s) for s in main_sector])
+        same_sector = (
+                (job_index.sector[np.newaxis, :] == main_sector_code[:, np.newaxis])
+                & (main_sector_code[:, np.newaxis] >= 0)
+                )
+        offset = 2 * np.abs(job_access).max(initial=0) + 1
+        rank_key = job_access + offset * same_sector
+
+    shown = np.repeat(
+            ((job_index.level >= show_level_min)
+             & (job_index.level <= show_level_max))[np.newaxis, :],
+            len(skill_weights),
+            axis=0,
+            )
+
+    if hide_practiced_jobs:
+        # Practiced jobs without skills aren't in the index
+        for i, practiced in enumerate(practiced_jobs):
+            positions = job_index.job_ids.get_indexer(list(practiced))
+            shown[i, positions[positions >= 0]] = False
+
+    return _RankedJobs(
+            job_access=job_access,
+            rank_key=np.where(shown, rank_key, -np.inf),
+            level_diff_weights=lvl_diff_weight,
+            )
+
+
+def _top_jobs(
+        rank_key: npt.NDArray[np.float64],
+        top_k: Optional[int],
+        ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.bool_]]:
+    # Positions of the best ranked jobs of each individual (rows of rank_key),
+    # and whether they are shown. With top_k, only the selected jobs are
+    # sorted after a partial selection.
+    if top_k is None or top_k >= rank_key.shape[1]:
+        top = np.argsort(-rank_key, axis=1, kind="stable")
+    else:
+        top = np.argpartition(-rank_key, top_k - 1, axis=1)[:, :top_k]
+        order = np.argsort(-np.take_along_axis(rank_key, top, axis=1),
+                           axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+    return top, np.isfinite(np.take_along_axis(rank_key, top, axis=1))
+
+
 @dataclass
 class JobAccessibility:
     job_accessibility: pa.DataFrame
     skill_contribution: pa.DataFrame
     skill_gap: pa.DataFrame
     level_diff_weights: pa.Series
+    # Accessibility of all the jobs that are not hidden, in no particular order.
+    # It is the same as job_accessibility unless top_k was given.
+    shown_job_accessibility: pa.Series
 
 
 def job_accessibility(
         model: Model,
         jobs: Jobs,
-        jobs_skills: JobsSkills,
+        jobs_skills: JobsSkills | SparseJobsSkills,
         same_sector_first: bool,
         hide_practiced_jobs: bool,
         weigh_by_level_diff: bool,
         show_level_min: int,
         show_level_max: int,
+        job_index: Optional[JobIndex] = None,
+        top_k: Optional[int] = None,
         ) -> JobAccessibility:
+    """Accessibility of each job given the individual's skills.
+
+    `job_index` should be built once with mk_job_index and passed to every
+    call. When it is given, `jobs` and `jobs_skills` are not used.
+
+    With `top_k`, only the top_k most accessible jobs are ranked and
+    explained. The explanations of other jobs can be computed on demand with
+    job_skill_contribution and job_skill_gap.
+    """
+
+    if job_index is None:
+        job_index = mk_job_index(jobs, jobs_skills)
+
+    ranked = _rank_jobs(
+            job_index,
+            job_index.skill_weights(model.skills)[np.newaxis, :],
+            np.array([model.level]),
+            [model.main_sector],
+            [model.experiences.job_id],
+            same_sector_first,
+            hide_practiced_jobs,
+            weigh_by_level_diff,
+            show_level_min,
+            show_level_max,
+            )
+    job_access = ranked.job_access[0]
+
+    top, shown = _top_jobs(ranked.rank_key, top_k)
+    order = top[0][shown[0]]
+    job_ids = job_index.job_ids[order]
+    shown_jobs = np.isfinite(ranked.rank_key[0])
+
+    return JobAccessibility(
+            job_accessibility=pa.Series(job_access[order], index=job_ids),
+            skill_contribution=job_skill_contribution(model, job_index, job_ids),
+            skill_gap=job_skill_gap(model, job_index, job_ids),
+            level_diff_weights=(
+                pa.Series(ranked.level_diff_weights[0], index=job_index.job_ids)
+                if ranked.level_diff_weights is not None else None
+                ),
+            shown_job_accessibility=pa.Series(
+                job_access[shown_jobs],
+                index=job_index.job_ids[shown_jobs],
+                ),
+            )
+
+
+def _selected_jobs_skills(
+        job_index: JobIndex,
+        job_ids: Iterable[int],
+        ) -> npt.NDArray[np.float64]:
+    selected = job_index.jobs_skills[job_index.positions(job_ids), :]
+    if sp.issparse(selected):
+        # Only the selected rows are converted to a dense matrix
+        selected = selected.toarray() # type:ignore
+    return selected.astype(float) # type:ignore
 
-    norm_job = np.sqrt((jobs_skills ** 2).sum(axis=1))
-    norm_indiv = np.sqrt((model.skills.weight ** 2).sum())
 
+def job_skill_contribution(
+        model: Model,
+        job_index: JobIndex,
+        job_ids: Iterable[int],
+        ) -> pa.DataFrame:
+    """The contribution of each skill to the accessibility of the given jobs.
+
+    Contributions are normalized so that they sum to 1 for each job.
+    """
+    job_ids = pa.Index(list(job_ids))
     skill_contribution = (
-            jobs_skills
-            .mul(model.skills.weight, axis="columns")
-            .div(norm_job * norm_indiv, axis="index")
+            _selected_jobs_skills(job_index, job_ids)
+            * job_index.skill_weights(model.skills)
             )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        skill_contribution_normalized = (
+                skill_contribution
+                / skill_contribution.sum(axis=1, keepdims=True)
+                )
 
-    job_access = skill_contribution.sum(axis=1)
-    job_access = job_access.sort_values(ascending=False)
+    return pa.DataFrame(
+            skill_contribution_normalized,
+            index=job_ids,
+            columns=job_index.skill_ids,
+            )
 
 
-    if weigh_by_level_diff:
-        lvl_diff_weight = 1 - (jobs.loc[job_access.index, "level"] - model.level) / 8
-        lvl_diff_weight.loc[lvl_diff_weight > 1] = 1
-        job_access = job_access * lvl_diff_weight
+def job_skill_gap(
+        model: Model,
+        job_index: JobIndex,
+        job_ids: Iterable[int],
+        ) -> pa.DataFrame:
+    """The skills required by the given jobs that the individual lacks.
 
-    if hide_practiced_jobs:
-        job_access = job_access.drop(model.experiences.job_id)
+    A value of 1 means that the individual doesn't have the skill at all.
+    """
+    job_ids = pa.Index(list(job_ids))
+    selected_jobs_skills = _selected_jobs_skills(job_index, job_ids)
+    skill_weights = job_index.skill_weights(model.skills)
+    scaled_skill = skill_weights / skill_weights.max()
+
+    return pa.DataFrame(
+            (selected_jobs_skills - scaled_skill) * selected_jobs_skills,
+            index=job_ids,
+            columns=job_index.skill_ids,
+            )
 
-    job_access = job_access.loc[
-            (jobs.loc[job_access.index, "level"] >= show_level_min) 
-            & (jobs.loc[job_access.index, "level"] <= show_level_max)
-            ]
 
-    if same_sector_first:
-        select_same_sector = jobs.sector == model.main_sector
-        same_sector_jobs = job_access.loc[select_same_sector].sort_values(ascending=False)
-        other_sectors_jobs = job_access.loc[~select_same_sector].sort_values(ascending=False)
-        job_access = pa.concat([same_sector_jobs, other_sectors_jobs])
-
-    skill_contribution_normalized = (
-            skill_contribution
-            .div(skill_contribution.sum(axis=1), axis="index")
-            .loc[job_access.index, :]
+# Many individuals can be scored at once by stacking their skill vectors in an
+# individuals × skills matrix. The job accessibility of every individual is
+# then given by a single matrix product with the jobs × skills matrix.
+
+@dataclass
+class Individuals:
+    skills: pa.DataFrame
+    main_sector: pa.Series
+    level: pa.Series
+    practiced_jobs: pa.Series
+
+
+def mk_individuals(models: list[Model]) -> Individuals:
+    index = pa.RangeIndex(len(models))
+    return Individuals(
+            skills=pa.DataFrame(
+                [m.skills.weight for m in models],
+                index=index,
+                ).fillna(0),
+            main_sector=pa.Series([m.main_sector for m in models], index=index),
+            level=pa.Series([m.level for m in models], index=index),
+            practiced_jobs=pa.Series(
+                [list(m.experiences.job_id) for m in models],
+                index=index,
+                ),
             )
 
-    scaled_skill = model.skills.weight / model.skills.weight.max()
-    skill_gap = (
-            (jobs_skills.loc[job_access.index, :] - scaled_skill) 
-            * jobs_skills.loc[job_access.index, :]
+
+def job_accessibility_batch(
+        individuals: Individuals,
+        jobs: Jobs,
+        jobs_skills: JobsSkills | SparseJobsSkills,
+        same_sector_first: bool,
+        hide_practiced_jobs: bool,
+        weigh_by_level_diff: bool,
+        show_level_min: int,
+        show_level_max: int,
+        top_k: int,
+        job_index: Optional[JobIndex] = None,
+        ) -> pa.DataFrame:
+    """The top_k most accessible jobs of each individual.
+
+    The jobs are ranked for each individual as job_accessibility would rank
+    them with the same options. The result has one row per individual and
+    rank, with the job id and its accessibility. As for job_accessibility,
+    `jobs` and `jobs_skills` are not used when `job_index` is given.
+
+    >>> jobs = mk_jobs(pa.DataFrame({"sector": [1, 1, 2], "level": [1, 2, 3]}))
+    >>> jobs_skills = mk_jobs_skills(pa.DataFrame([[1, 0], [1, 1], [0, 1]]))
+    >>> individuals = Individuals(
+    ...     skills=pa.DataFrame([[1.0, 0.0], [0.0, 2.0]]),
+    ...     main_sector=pa.Series([1, 2]),
+    ...     level=pa.Series([1, 3]),
+    ...     practiced_jobs=pa.Series([[0], [2]]),
+    ...     )
+    >>> job_accessibility_batch(individuals, jobs, jobs_skills,
+    ...     same_sector_first=True, hide_practiced_jobs=True,
+    ...     weigh_by_level_diff=False, show_level_min=1, show_level_max=8,
+    ...     top_k=2).round(3) # doctest: +NORMALIZE_WHITESPACE
+                     job  job_accessibility
+    individual rank
+    0          0       1              0.707
+               1       2              0.000
+    1          0       1              0.707
+               1       0              0.000
+    """
+
+    if job_index is None:
+        job_index = mk_job_index(jobs, jobs_skills)
+
+    ranked = _rank_jobs(
+            job_index,
+            (individuals.skills
+             .reindex(columns=job_index.skill_ids, fill_value=0)
+             .to_numpy(dtype=float)),
+            individuals.level.to_numpy(),
+            individuals.main_sector,
+            individuals.practiced_jobs,
+            same_sector_first,
+            hide_practiced_jobs,
+            weigh_by_level_diff,
+            show_level_min,
+            show_level_max,
             )
 
-    return JobAccessibility(
-            job_accessibility=job_access,
-            skill_contribution=skill_contribution_normalized, 
-            skill_gap=skill_gap,
-            level_diff_weights=lvl_diff_weight if weigh_by_level_diff else None,
+    top, shown = _top_jobs(ranked.rank_key, top_k)
+    n_individuals, k = top.shape
+
+    return (pa.DataFrame({
+                "individual": np.repeat(individuals.skills.index.to_numpy(), k),
+                "rank": np.tile(np.arange(k), n_individuals),
+                "job": job_index.job_ids.to_numpy()[top].ravel(),
+                "job_accessibility": np.take_along_axis(ranked.job_access, top, axis=1).ravel(),
+                })
+            .loc[shown.ravel(), :]
+            .set_index(["individual", "rank"])
             )
 
 
+# Skill accessibility compares the individual's skills with the skills each
+# skill co-occurs with, leaving out the skill itself. The co-occurrence matrix
+# without its diagonal and its row norms don't depend on the individual, they
+# are computed once in a MaskedSkillCooccurrence.
+
+@dataclass(frozen=True)
+class MaskedSkillCooccurrence:
+    skill_ids: pa.Index
+    # Dense array, or CSR matrix when built from a SparseSkillCooccurrence
+    matrix: npt.NDArray[np.float64] | sp.csr_array
+    norms: npt.NDArray[np.float64]
+
+
+def mk_masked_skill_cooccurrence(
+        skill_cooc: SkillCooccurrence | SparseSkillCooccurrence,
+        ) -> MaskedSkillCooccurrence:
+    """The skill co-occurrence matrix with a null diagonal.
+
+    >>> masked = mk_masked_skill_cooccurrence(skill_cooccurrence(
+    ...     mk_jobs_skills(pa.DataFrame([[1, 1, 0], [1, 0, 1], [1, 1, 1]]))))
+    >>> masked.matrix
+    array([[0., 2., 2.],
+           [2., 0., 1.],
+           [2., 1., 0.]])
+    >>> masked.norms.round(3)
+    array([2.828, 2.236, 2.236])
+    """
+    if isinstance(skill_cooc, SparseFrame):
+        matrix = sp.csr_array(skill_cooc.matrix, dtype=float)
+        matrix = sp.csr_array(matrix - sp.csr_array(sp.diags(matrix.diagonal())))
+        matrix.eliminate_zeros()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    else:
+        matrix = skill_cooc.to_numpy(dtype=float, copy=True)
+        np.fill_diagonal(matrix, 0)
+        norms = np.sqrt((matrix ** 2).sum(axis=1))
+
+    return MaskedSkillCooccurrence(
+            skill_ids=skill_cooc.index,
+            matrix=matrix,
+            norms=norms,
+            )
+
+
+# The referential gets small edits, where a job gains or loses a few skills.
+# Since the co-occurrence matrix is the sum over jobs of the outer product of
+# each job skill vector with itself, a job whose vector changes from r to r'
+# changes it by r'r'ᵀ - rrᵀ, which is non-zero only on the skills of the job.
+# IncrementalSkillCooccurrence applies these low-rank updates to a sparse
+# co-occurrence matrix and keeps the row norms of the masked co-occurrence
+# matrix up to date. An update costs the non-zero entries of the matrix, not
+# the square of the number of skills.
+
+JobSkillEdge = Tuple[int, int]
+
+
+class IncrementalSkillCooccurrence:
+    """A skill co-occurrence matrix maintained under job-skill edge changes.
+
+    The co-occurrence matrices are sparse if `jobs_skills` is.
+
+    >>> jobs_skills = mk_jobs_skills(pa.DataFrame(
+    ...     [[1, 1, 0], [0, 1, 1]], index=[10, 11], columns=[0, 1, 2]))
+    >>> cooc = IncrementalSkillCooccurrence(jobs_skills)
+    >>> cooc.apply(added=[(10, 2)], removed=[(11, 1)])
+    >>> cooc.skill_cooccurrence()
+       0  1  2
+    0  1  1  1
+    1  1  1  1
+    2  1  1  2
+    >>> (cooc.skill_cooccurrence()
+    ...  .equals(skill_cooccurrence(cooc.jobs_skills())))
+    True
+    >>> cooc.apply(added=[(10, 1)], removed=[(10, 1)])
+    Traceback (most recent call last):
+    ...
+    ValueError: Edges both added and removed: [(10, 1)]
+    """
+
+    def __init__(self, jobs_skills: JobsSkills | SparseJobsSkills):
+        self._sparse = isinstance(jobs_skills, SparseFrame)
+        if isinstance(jobs_skills, SparseFrame):
+            matrix = jobs_skills.matrix
+        else:
+            matrix = sp.csr_array(jobs_skills.to_numpy())
+        matrix = sp.csr_array(matrix.astype(np.int64))
+
+        self.job_ids: pa.Index = jobs_skills.index
+        self.skill_ids: pa.Index = jobs_skills.columns
+        # Rows are edited in place, which the LIL format does efficiently.
+        self._jobs_skills = sp.lil_array(matrix, dtype=np.int64)
+        self._cooc: sp.csr_array = sp.csr_array(matrix.T @ matrix)
+        self._masked_sq_norms: npt.NDArray[np.float64] = self._masked_sq_norms_of(
+                np.arange(len(self.skill_ids)))
+
+    def _masked_sq_norms_of(self, rows: npt.NDArray[np.int64]) -> npt.NDArray[np.float64]:
+        squares = self._cooc[rows, :].astype(float)
+        squares.data **= 2
+        return (np.asarray(squares.sum(axis=1)).ravel()
+                - self._cooc.diagonal()[rows].astype(float) ** 2)
+
+    def apply(
+            self,
+            added: Iterable[JobSkillEdge] = (),
+            removed: Iterable[JobSkillEdge] = (),
+            ) -> None:
+        """Add and remove job-skill edges.
+
+        Adding an existing edge or removing a missing one has no effect.
+        Raises a KeyError for unknown jobs or skills, and a ValueError for
+        edges both added and removed.
+        """
+        added, removed = list(added), list(removed)
+        both = sorted(set(added) & set(removed))
+        if len(both) > 0:
+            raise ValueError(f"Edges both added and removed: {both}")
+
+        new_values: dict[int, dict[int, int]] = {}
+        for value, edges in ((1, added), (0, removed)):
+            for job, skill in edges:
+                j = self.job_ids.get_loc(job)
+                s = self.skill_ids.get_loc(skill)
+                new_values.setdefault(j, {})[s] = value
+
+        # The updates of all the jobs are summed in a sparse delta matrix.
+        delta_rows, delta_columns, delta_values = [], [], []
+        affected_skills = set()
+
+        for j, values in new_values.items():
+            old_row = self._jobs_skills[[j], :].toarray().ravel()
+            new_row = old_row.copy()
+            for s, value in values.items():
+                new_row[s] = value
+
+            support = np.flatnonzero(old_row | new_row)
+            old, new = old_row[support], new_row[support]
+            rows, columns = np.meshgrid(support, support, indexing="ij")
+            delta_rows.append(rows.ravel())
+            delta_columns.append(columns.ravel())
+            delta_values.append((np.outer(new, new) - np.outer(old, old)).ravel())
+
+            for s, value in values.items():
+                self._jobs_skills[j, s] = value
+            affected_skills.update(support)
+
+        if len(affected_skills) == 0:
+            return
+
+        delta = sp.coo_array(
+                (np.concatenate(delta_values),
+                 (np.concatenate(delta_rows), np.concatenate(delta_columns))),
+                shape=self._cooc.shape,
+                )
+        cooc = sp.csr_array(self._cooc + delta)
+        cooc.eliminate_zeros()
+        self._cooc = cooc
+
+        rows = np.array(sorted(affected_skills), dtype=int)
+        self._masked_sq_norms[rows] = self._masked_sq_norms_of(rows)
+
+    def jobs_skills(self) -> JobsSkills | SparseJobsSkills:
+        if self._sparse:
+            return SparseJobsSkills(SparseFrame(
+                    matrix=sp.csr_array(self._jobs_skills),
+                    index=self.job_ids,
+                    columns=self.skill_ids,
+                    ))
+        return JobsSkills(pa.DataFrame(
+                self._jobs_skills.toarray(),
+                index=self.job_ids,
+                columns=self.skill_ids,
+                ))
+
+    def skill_cooccurrence(self) -> SkillCooccurrence | SparseSkillCooccurrence:
+        if self._sparse:
+            return SparseSkillCooccurrence(SparseFrame(
+                    matrix=self._cooc.copy(),
+                    index=self.skill_ids,
+                    columns=self.skill_ids,
+                    ))
+        return SkillCooccurrence(pa.DataFrame(
+                self._cooc.toarray(),
+                index=self.skill_ids,
+                columns=self.skill_ids,
+                ))
+
+    def masked_skill_cooccurrence(self) -> MaskedSkillCooccurrence:
+        matrix = sp.csr_array(self._cooc.astype(float))
+        matrix.setdiag(0)
+        matrix.eliminate_zeros()
+        return MaskedSkillCooccurrence(
+                skill_ids=self.skill_ids,
+                matrix=matrix if self._sparse else matrix.toarray(),
+                norms=np.sqrt(self._masked_sq_norms),
+                )
+
+
 @dataclass
 class SkillAccessibility:
     skill_accessibility: pa.DataFrame
@@ -228,46 +836,79 @@ class SkillAccessibility:
 
 def skill_accessibility(
         model: Model,
-        skill_cooc: SkillCooccurrence,
+        skill_cooc: Optional[SkillCooccurrence | SparseSkillCooccurrence] = None,
+        masked_skill_cooc: Optional[MaskedSkillCooccurrence] = None,
+        explained_skills: Optional[Iterable[int]] = None,
+        top_n: Optional[int] = None,
         ) -> SkillAccessibility:
+    """Accessibility of each skill given the individual's skills.
 
-    mask = pa.DataFrame(np.ones(skill_cooc.shape),
-                        index=skill_cooc.index,
-                        columns=skill_cooc.columns)
-    for i,j in zip(skill_cooc.index, skill_cooc.index):
-        mask.loc[i,j] = 0
-
-    skill_cooc = skill_cooc * mask
-
-    norm_skill = np.sqrt((skill_cooc ** 2).sum(axis=1))
-    norm_indiv = np.sqrt((model.skills.weight ** 2).sum())
+    `masked_skill_cooc` should be built once with mk_masked_skill_cooccurrence
+    and passed to every call, `skill_cooc` is then not needed. One of them
+    must be given, otherwise a ValueError is raised. The skill contributions are computed for `explained_skills` only, or for all
+    the skills if it is None.
 
-    skill_contribution = (
-            skill_cooc
-            .mul(model.skills.weight, axis="columns")
-            .div(norm_skill * norm_indiv, axis="index")
-            )
-
-    skill_access = skill_contribution.sum(axis=1)
-    skill_access = skill_access.sort_values(ascending=False)
+    With `top_n`, only the top_n most accessible skills are returned, and
+    explained if `explained_skills` is None.
+    """
 
-    skill_contribution_normalized = (
-            skill_contribution.div(skill_contribution.sum(axis=1), axis="index")
-            )
-    skill_contribution_normalized.loc[skill_access.index, :]
+    if masked_skill_cooc is None:
+        if skill_cooc is None:
+            raise ValueError("Either skill_cooc or masked_skill_cooc must be given")
+        masked_skill_cooc = mk_masked_skill_cooccurrence(skill_cooc)
+
+    skill_ids = masked_skill_cooc.skill_ids
+    skill_weights = (model.skills.weight
+                     .reindex(skill_ids, fill_value=0)
+                     .to_numpy(dtype=float))
+    norm_indiv = np.sqrt((skill_weights ** 2).sum())
+
+    # Skills that never co-occur with another skill, or an individual without
+    # any skill, give an accessibility of 0.
+    cooc_dot_skill = masked_skill_cooc.matrix @ skill_weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        skill_access = np.nan_to_num(
+                cooc_dot_skill / (masked_skill_cooc.norms * norm_indiv),
+                nan=0.0,
+                )
 
-    scaled_skill = model.skills.weight / model.skills.weight.max()
-    skill_gap = (skill_cooc - scaled_skill) * skill_cooc
+    if top_n is None or top_n >= len(skill_ids):
+        order = np.argsort(-skill_access, kind="stable")
+    else:
+        order = np.argpartition(-skill_access, top_n - 1)[:top_n]
+        order = order[np.argsort(-skill_access[order], kind="stable")]
+
+    if explained_skills is None:
+        explained = order if top_n is not None else np.arange(len(skill_ids))
+    else:
+        explained = skill_ids.get_indexer(list(explained_skills))
+
+    # The contribution of each skill to a skill accessibility, normalized so
+    # that contributions sum to 1 for each skill.
+    selected_cooc = masked_skill_cooc.matrix[explained, :]
+    if sp.issparse(selected_cooc):
+        selected_cooc = selected_cooc.toarray() # type:ignore
+    with np.errstate(divide="ignore", invalid="ignore"):
+        skill_contribution_normalized = (
+                selected_cooc * skill_weights
+                / cooc_dot_skill[explained, np.newaxis]
+                )
 
     return SkillAccessibility(
-            skill_accessibility=skill_access,
-            skill_contribution=skill_contribution_normalized,
+            skill_accessibility=pa.Series(skill_access[order],
+                                          index=skill_ids[order]),
+            skill_contribution=pa.DataFrame(
+                skill_contribution_normalized,
+                index=skill_ids[explained],
+                columns=skill_ids,
+                ),
             )
 
 
 def job_accessibility_derivative(
         model: Model,
-        jobs_skills: JobsSkills,
+        jobs_skills: JobsSkills | SparseJobsSkills,
+        job_index: Optional[JobIndex] = None,
         ):
     r"""
     Job accessibility sensitivity to skill variation. Returns the partial 
@@ -297,34 +938,72 @@ def job_accessibility_derivative(
 
     """
 
-    norm_job = np.sqrt((jobs_skills ** 2).sum(axis=1))
-    norm_skills = np.sqrt((model.skills.weight ** 2).sum())
-
-    # Dot product of each job vector and the individual's skill vector
-    job_dot_skill = (
-            jobs_skills
-            .mul(model.skills.weight, axis="columns")
-            .sum(axis="columns")
-            )
+    job_ids, skill_ids, derivative = _job_accessibility_derivative(
+            model, jobs_skills, job_index)
 
-    job_accessibility_derivative = pa.DataFrame(
-            np.empty((len(model.skills), len(jobs_skills))),
-            index = model.skills.index,
-            columns = jobs_skills.index,
+    return pa.DataFrame(
+            derivative,
+            index = skill_ids,
+            columns = job_ids,
             )
 
-    # Compute the derivative for each individual skill
-    for i in model.skills.index:
-        s_i = model.skills.weight.loc[i]
-        j_i = jobs_skills.loc[:, i]
 
-        job_accessibility_derivative.loc[i, :] = (
-                (j_i / norm_skills)
-                 - (s_i * job_dot_skill / (norm_skills ** 3))
-        )
+def _job_accessibility_derivative(
+        model: Model,
+        jobs_skills: JobsSkills | SparseJobsSkills,
+        job_index: Optional[JobIndex],
+        ) -> tuple[pa.Index, pa.Index, npt.NDArray[np.float64]]:
+    job_ids, skill_ids, jobs_matrix, skill_weights = _derivative_inputs(
+            model, jobs_skills, job_index)
+    return job_ids, skill_ids, _derivative_rows(
+            jobs_matrix, skill_weights, np.arange(len(skill_ids)))
 
-    return job_accessibility_derivative
 
+def _derivative_inputs(
+        model: Model,
+        jobs_skills: JobsSkills | SparseJobsSkills,
+        job_index: Optional[JobIndex],
+        ) -> tuple[pa.Index, pa.Index, Any, npt.NDArray[np.float64]]:
+    # The jobs × skills matrix, dense or sparse, with its labels and the
+    # individual's skill vector over its columns.
+    if job_index is None:
+        job_ids = jobs_skills.index
+        skill_ids = jobs_skills.columns
+        if isinstance(jobs_skills, SparseFrame):
+            jobs_matrix = jobs_skills.matrix
+        else:
+            jobs_matrix = jobs_skills.to_numpy(dtype=float)
+    else:
+        job_ids = job_index.job_ids
+        skill_ids = job_index.skill_ids
+        jobs_matrix = job_index.jobs_skills
+
+    skill_weights = (model.skills.weight
+                     .reindex(skill_ids, fill_value=0)
+                     .to_numpy(dtype=float))
+    return job_ids, skill_ids, jobs_matrix, skill_weights
+
+
+def _derivative_rows(
+        jobs_matrix: Any,
+        skill_weights: npt.NDArray[np.float64],
+        rows: npt.NDArray[np.int64],
+        ) -> npt.NDArray[np.float64]:
+    # The derivative with respect to the skills at the given positions: the
+    # transposed jobs matrix minus the outer product of the skill vector and
+    # the dot products of each job vector and the skill vector.
+    norm_skills = np.sqrt((skill_weights ** 2).sum())
+    job_dot_skill = jobs_matrix @ skill_weights
+
+    skills_jobs = jobs_matrix[:, rows].T
+    if sp.issparse(skills_jobs):
+        skills_jobs = skills_jobs.toarray() # type:ignore
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (
+                skills_jobs / norm_skills
+                - np.outer(skill_weights[rows], job_dot_skill / (norm_skills ** 3))
+                )
 
 
 @dataclass
@@ -334,34 +1013,63 @@ class SkillPotential:
 
 def skill_potential(
         model: Model,
-        jobs_skills: JobsSkills,
+        jobs_skills: JobsSkills | SparseJobsSkills,
         job_accessibility: JobAccessibility,
         weigh_by_level_diff: bool,
         weigh_by_job_accessibility: bool,
+        job_index: Optional[JobIndex] = None,
+        top_n: Optional[int] = None,
         ):
+    """How much developing each skill would increase job accessibility.
 
-    per_job = job_accessibility_derivative(model, jobs_skills)
-
-    # Compute the derivative for each individual skill
-    for i in model.skills.index:
-        s_i = model.skills.weight.loc[i]
-        j_i = jobs_skills.loc[:, i]
-
-
-        if weigh_by_level_diff:
-            per_job.loc[i, :] = (
-                    per_job.loc[i, :]
-                    * job_accessibility.level_diff_weights
-                    )
-
-        if weigh_by_job_accessibility:
-            per_job.loc[i, :] = (
-                    per_job.loc[i, :]
-                    * job_accessibility.job_accessibility
-                    )
-
-    average = per_job.mean(axis="columns").sort_values(ascending=False)
+    With `top_n`, only the top_n skills with the highest average potential are
+    returned.
+    """
 
-    per_job = per_job.loc[average.index, :]
+    job_ids, skill_ids, jobs_matrix, skill_weights = _derivative_inputs(
+            model, jobs_skills, job_index)
 
-    return SkillPotential(per_job=per_job, average=average)
+    # Jobs missing from the weights, such as hidden jobs, get a NaN potential
+    # and are left out of the average.
+    job_weights = np.ones(len(job_ids))
+    if weigh_by_level_diff:
+        job_weights = job_weights * (job_accessibility.level_diff_weights
+                                     .reindex(job_ids)
+                                     .to_numpy(dtype=float))
+
+    if weigh_by_job_accessibility:
+        job_weights = job_weights * (job_accessibility.shown_job_accessibility
+                                     .reindex(job_ids)
+                                     .to_numpy(dtype=float))
+
+    # The weighted sum of the derivative over the jobs doesn't need the
+    # skills × jobs derivative itself: it is the product of the transposed
+    # jobs matrix and the job weights, minus a rank one term.
+    counted = ~np.isnan(job_weights)
+    counted_weights = np.where(counted, job_weights, 0.0)
+    norm_skills = np.sqrt((skill_weights ** 2).sum())
+    weighted_dot_skill = (jobs_matrix @ skill_weights) @ counted_weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = (
+                (jobs_matrix.T @ counted_weights) / norm_skills
+                - skill_weights * weighted_dot_skill / (norm_skills ** 3)
+                ) / counted.sum()
+
+    rank_key = np.where(np.isnan(average), -np.inf, average)
+    if top_n is None or top_n >= len(skill_ids):
+        order = np.argsort(-rank_key, kind="stable")
+    else:
+        order = np.argpartition(-rank_key, top_n - 1)[:top_n]
+        order = order[np.argsort(-rank_key[order], kind="stable")]
+
+    # The potential for each job is only computed for the returned skills.
+    per_job = _derivative_rows(jobs_matrix, skill_weights, order) * job_weights
+
+    return SkillPotential(
+            per_job=pa.DataFrame(
+                per_job,
+                index=skill_ids[order],
+                columns=job_ids,
+                ),
+            average=pa.Series(average[order], index=skill_ids[order]),
+            )
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import Iterable, Hashable
+import pandas as pa
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse as sp
+
+
+# The jobs × skills and experiences × skills matrices are binary and mostly
+# filled with zeros. They can be stored as a scipy CSR matrix with row and
+# column labels, which only takes memory for the non-zero entries.
+
+@dataclass(frozen=True)
+class SparseFrame:
+    matrix: sp.csr_array
+    index: pa.Index
+    columns: pa.Index
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.matrix.shape # type:ignore
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def positions(self, labels: Iterable[Hashable]) -> npt.NDArray[np.int64]:
+        """Row positions of the given labels.
+
+        Raises a KeyError if a label is missing, like DataFrame.loc.
+        """
+        labels = list(labels)
+        positions = self.index.get_indexer(labels)
+        if (positions < 0).any():
+            missing = [l for l, p in zip(labels, positions) if p < 0]
+            raise KeyError(f"{missing} not in index")
+        return positions
+
+    def rows(self, labels: Iterable[Hashable]) -> "SparseFrame":
+        labels = list(labels)
+        return SparseFrame(
+                matrix=self.matrix[self.positions(labels), :], # type:ignore
+                index=pa.Index(labels),
+                columns=self.columns,
+                )
+
+    def to_frame(self) -> pa.DataFrame:
+        return pa.DataFrame(
+                self.matrix.toarray(),
+                index=self.index,
+                columns=self.columns,
+                )
+
+
+def sparse_frame(df: pa.DataFrame) -> SparseFrame:
+    """Convert a data frame to a SparseFrame.
+
+    Data frames with pandas sparse columns are converted without allocating
+    the dense matrix.
+
+    >>> sf = sparse_frame(pa.DataFrame([[1, 0], [0, 0], [1, 1]], index=[3, 4, 5]))
+    >>> sf.matrix.nnz
+    3
+    >>> sf.rows([5, 3]).to_frame()
+       0  1
+    5  1  1
+    3  1  0
+    """
+    if len(df.columns) > 0 and all(isinstance(t, pa.SparseDtype) for t in df.dtypes):
+        matrix = sp.csr_array(df.sparse.to_coo())
+    else:
+        matrix = sp.csr_array(df.to_numpy())
+
+    return SparseFrame(matrix=matrix, index=df.index, columns=df.columns)
+
+
+# The matrices may be stored with compact types, like uint8, which would
+# overflow when summing their entries, in matrix products for instance.
+
+def count_dtype(dtype: npt.DTypeLike) -> np.dtype:
+    """A type holding sums of values of dtype without overflowing.
+
+    >>> count_dtype(np.uint8), count_dtype(np.float32)
+    (dtype('int64'), dtype('float64'))
+    """
+    return np.promote_types(dtype, np.int64)
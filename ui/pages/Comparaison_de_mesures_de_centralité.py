@@ -9,6 +9,7 @@ import numpy as np
 import pandas as pa
 import streamlit as st
 from typing import Callable
+from oplc_model.catalog import mk_catalog
 
 st.header("Comparaison de mesures de centralité")
 
@@ -76,8 +77,7 @@ plt.ioff()
 
 model = oplc.model.get()
 
-exp_from_name = {exp.name: exp_id
-                 for exp_id, exp in model.experiences.items()}
+experience_catalog = mk_catalog(model.experiences)
 
 
 def format_experience(experience_id):
@@ -87,7 +87,7 @@ def format_experience(experience_id):
 @st.cache
 def experience_ids(experience_names: list[str]):
     return [
-        exp_from_name[name]
+        experience_catalog.id_by_name(name)
         for name in experience_names
     ]
 
@@ -141,15 +141,18 @@ def show_graph(job_rec: JobRecommendation,
 
     fig, ax = plt.subplots(1, 1, figsize=(10, 7))
 
-    for u, v in job_rec.skill_graph.graph.edges:
-        if u != v:
-            ax.plot(
-                [nodes.loc[u, "x"], nodes.loc[v, "x"]],
-                [nodes.loc[u, "y"], nodes.loc[v, "y"]],
-                color="black",
-                linewidth=1,
-                zorder=1,
-            )
+    edges = [(u, v) for u, v in job_rec.skill_graph.graph.edges if u != v]
+    sources = nodes.reindex([u for u, _ in edges])
+    targets = nodes.reindex([v for _, v in edges])
+    for x0, y0, x1, y1 in zip(sources.x.to_numpy(), sources.y.to_numpy(),
+                              targets.x.to_numpy(), targets.y.to_numpy()):
+        ax.plot(
+            [x0, x1],
+            [y0, y1],
+            color="black",
+            linewidth=1,
+            zorder=1,
+        )
     s = ax.scatter(nodes.x, nodes.y, c=nodes.centrality, s=400, zorder=2,
                    cmap="viridis")
     for x, y, e, c in zip(nodes.x, nodes.y, nodes.index, nodes.centrality):
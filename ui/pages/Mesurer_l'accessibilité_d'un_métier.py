@@ -3,6 +3,7 @@ from os import fdopen
 import networkx as nx
 import oplc_etl.pipelines.neo4j as etl
 from oplc_model import model_skill_cooc as m
+from oplc_model.catalog import mk_catalog
 import numpy as np
 import pandas as pa
 import streamlit as st
@@ -31,10 +32,20 @@ def get_data():
     sectors = m.mk_sectors(data.sectors)
     jobs_skills = m.mk_jobs_skills(data.jobs_skills)
     skill_cooc = m.skill_cooccurrence(jobs_skills)
+    job_index = m.mk_job_index(jobs, jobs_skills)
+    masked_skill_cooc = m.mk_masked_skill_cooccurrence(skill_cooc)
+    job_titles = mk_catalog(jobs["title"].to_dict(), name=str)
+    skill_titles = mk_catalog(skills["title"].to_dict(), name=str)
 
-    return (skills, jobs, sectors, jobs_skills, skill_cooc)
+    return (skills, jobs, sectors, jobs_skills, job_index, masked_skill_cooc,
+            job_titles, skill_titles)
 
-skills, jobs, sectors, jobs_skills, skill_cooc = get_data()
+(skills, jobs, sectors, jobs_skills, job_index, masked_skill_cooc,
+ job_titles, skill_titles) = get_data()
+
+# Columns looked up for each option of the select boxes
+job_romes = jobs["ROME"].to_dict()
+sector_labels = dict(zip(sectors.index, zip(sectors["ROME"], sectors["title"])))
 
 
 
@@ -77,7 +88,7 @@ for i in range(len(st.session_state.exp_input_job_id)):
             jobs.index,
             index=jobs.index.tolist().index(st.session_state.exp_input_job_id[i]),
             key=i,
-            format_func=lambda x: f"(ROME {jobs.loc[x, 'ROME']}) {jobs.loc[x, 'title']}",
+            format_func=lambda x: f"(ROME {job_romes[x]}) {job_titles[x]}",
             )
     (col1, col2) = st.columns(2)
 
@@ -117,7 +128,7 @@ indiv_model = m.model(st.session_state.indiv_exp, jobs, jobs_skills)
 with st.expander("Expériences (détails)"):
     st.table(
             indiv_model.experiences
-            .assign(Nom=[jobs.loc[i, "title"] for i in indiv_model.experiences.job_id])
+            .assign(Nom=[job_titles[i] for i in indiv_model.experiences.job_id])
             .rename(columns={
                 "begin": "Début",
                 "end": "Fin",
@@ -136,7 +147,7 @@ with st.expander("Compétences (détails)"):
 
     st.table(
             indiv_skills_nonzero
-            .assign(Nom=[skills.loc[i, "title"] for i in indiv_skills_nonzero.index])
+            .assign(Nom=[skill_titles[i] for i in indiv_skills_nonzero.index])
             .rename(columns={"weight": "Importance"})
             .loc[:, ["Nom", "Importance"]]
     )
@@ -145,13 +156,13 @@ with st.expander("Compétences (détails)"):
 indiv_model.main_job = st.selectbox("Votre métier de référence est :",
         jobs.index,
         index=jobs.index.tolist().index(indiv_model.main_job),
-        format_func=lambda x: f"{x}: ({jobs.loc[x, 'ROME']}) {jobs.loc[x, 'title']}"
+        format_func=lambda x: f"{x}: ({job_romes[x]}) {job_titles[x]}"
         )
 
 indiv_model.main_sector = st.selectbox(f"Votre secteur d'activité principal est :",
                 sectors.index,
                 index=sectors.index.tolist().index(indiv_model.main_sector),
-                format_func=lambda x: f"{x}: ({sectors.loc[x, 'ROME']}) {sectors.loc[x, 'title']}",
+                format_func=lambda x: f"{x}: ({sector_labels[x][0]}) {sector_labels[x][1]}",
                 )
 
 indiv_model.indiv_level = st.number_input("Votre niveau CEC est ",
@@ -208,29 +219,49 @@ job_access = m.job_accessibility(
         weigh_by_level_diff,
         show_level_min,
         show_level_max,
+        job_index=job_index,
+        top_k=n_recommended_jobs,
         )
 
-skill_access = m.skill_accessibility(indiv_model, skill_cooc)
+# Only the skills to develop for the jobs shown below need to be explained
+skills_to_develop = job_access.skill_gap.columns[
+        (job_access.skill_gap >= 1.0).any(axis=0)
+        ]
+skill_access = m.skill_accessibility(indiv_model,
+                                     masked_skill_cooc=masked_skill_cooc,
+                                     explained_skills=skills_to_develop)
 
 job_list_markdown = ""
 
-for j in job_access.job_accessibility.index[:n_recommended_jobs]:
+shown_jobs = job_access.job_accessibility.index[:n_recommended_jobs]
+shown_levels = jobs["level"].reindex(shown_jobs).to_numpy()
+shown_level_diff_weights = (
+        job_access.level_diff_weights.reindex(shown_jobs).to_numpy()
+        if weigh_by_level_diff else np.ones(len(shown_jobs))
+        )
+
+for j, access, level, level_diff_weight in zip(
+        shown_jobs,
+        job_access.job_accessibility.to_numpy()[:n_recommended_jobs],
+        shown_levels,
+        shown_level_diff_weights,
+        ):
 
-    job_list_markdown += f"1. **{jobs.loc[j, 'title']}** (accessibilité du métier: {job_access.job_accessibility.loc[j]:.2f})\n"
+    job_list_markdown += f"1. **{job_titles[j]}** (accessibilité du métier: {access:.2f})\n"
 
     job_list_markdown += f"    - En raison de votre expérience pour :\n"
     for s in job_access.skill_contribution.loc[j, :].sort_values(ascending=False).loc[lambda x: x > 0].index:
-        job_list_markdown += f"       - *{skills.loc[s, 'title']}*\n"
+        job_list_markdown += f"       - *{skill_titles[s]}*\n"
 
-    if weigh_by_level_diff and job_access.level_diff_weights.loc[j] < 1:
-        job_list_markdown += f"    - Le niveau CEC du métier est supérieur au vôtre (CEC: {jobs.loc[j, 'level']})\n"
+    if weigh_by_level_diff and level_diff_weight < 1:
+        job_list_markdown += f"    - Le niveau CEC du métier est supérieur au vôtre (CEC: {level})\n"
 
     job_list_markdown += f"    - Vous devrez développer les compétences suivantes :\n"
     for s in job_access.skill_gap.loc[j, :].sort_values(ascending=False).loc[lambda x: x >= 1.0].index:
         sa = skill_access.skill_accessibility.loc[s]
-        job_list_markdown += f"       - *{skills.loc[s, 'title']}* (accessibilité de la compétence: {sa:.2f} car vous savez déjà "
+        job_list_markdown += f"       - *{skill_titles[s]}* (accessibilité de la compétence: {sa:.2f} car vous savez déjà "
         for sc in skill_access.skill_contribution.loc[s,:].sort_values(ascending=False).loc[lambda x: x > 0].index:
-            job_list_markdown += f"*{skills.loc[sc, 'title']}*; "
+            job_list_markdown += f"*{skill_titles[sc]}*; "
         job_list_markdown += ")\n"
 st.write(job_list_markdown)
 
@@ -263,23 +294,24 @@ with st.expander("Qu'est-ce que ça veut dire ?"):
     """)
 
 
-skill_potential = m.skill_potential(indiv_model, jobs_skills, job_access,
-        weigh_by_level_diff, weigh_by_job_accessibility)
-
 n_recommended_skills = st.number_input("Combien de compétences afficher ?", 1, 30, value=10, step=5)
 
+skill_potential = m.skill_potential(indiv_model, jobs_skills, job_access,
+        weigh_by_level_diff, weigh_by_job_accessibility, job_index=job_index,
+        top_n=n_recommended_skills)
+
 markdown = ""
 
 for s in skill_potential.average.index[:n_recommended_skills]:
 
-    markdown += f"1. **{skills.loc[s, 'title'].strip()}**\n"
+    markdown += f"1. **{skill_titles[s].strip()}**\n"
     markdown += f"    - En approfondissant cette compétence, vous augmentez l'accessibilité des métiers suivants :\n"
 
     jobs_with_increased_access = skill_potential.per_job.loc[s, :].sort_values(ascending=False).loc[lambda x: x > 0].index
     # jobs_with_increased_access = job_access.job_accessibility.sort_values(ascending=False).loc[lambda x: x > 0].index
 
     for j in jobs_with_increased_access:
-        markdown += f"        - {jobs.loc[j, 'title']}\n"
+        markdown += f"        - {job_titles[j]}\n"
 
 
 st.write(markdown)
@@ -37,11 +37,13 @@ experiences_skills = oplc.model.model.experiences_skills.df
 
 skill_cooc = skills_jobs.dot(skills_jobs.transpose())
 
+experience_names = experiences["name"].to_dict()
+
 indiv_exp = st.multiselect(
         "Experiences",
         experiences.index,
         default=[1,2,3],
-        format_func=lambda x: f"{x}: {experiences.loc[x, 'name']}",
+        format_func=lambda x: f"{x}: {experience_names[x]}",
         )
 
 st.write("Expériences sélectionnées:")